@@ -1,17 +1,97 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash
+from flask import Flask, Response, render_template, request, redirect, url_for, session, flash, g, jsonify, \
+    get_template_attribute, stream_with_context
+from markupsafe import Markup
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from collections import Counter, defaultdict, namedtuple
+from datetime import date, datetime, timedelta
+import click
+import csv
+import functools
+import hashlib
+import json
+import logging
 import os
+import random
+import re
+import socket
+import threading
+import time
+
+import assets
+import availability
+import cache
+import database
+import events
+import jobs
+import matching
+import metrics
+import migrations
+import notify
 
 app = Flask(__name__)
 app.secret_key = "krishikaya"
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + os.path.join(BASE_DIR, "krishikaya.db")
+app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get(
+    "DATABASE_URL", "sqlite:///" + os.path.join(BASE_DIR, "krishikaya.db")
+)
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-
-db = SQLAlchemy(app)
+# one pooled connection per gunicorn thread (see Procfile), plus headroom for bursts
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+    "pool_size": int(os.environ.get("DB_POOL_SIZE", 16)),
+    "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 8)),
+    "pool_timeout": 10,
+}
+# optional read-only pool for dashboard GETs, see database.py
+if os.environ.get("DATABASE_READ_URL"):
+    app.config["SQLALCHEMY_BINDS"] = {database.READ_BIND: os.environ["DATABASE_READ_URL"]}
+app.config["SQLITE_PRAGMAS"] = database.pragmas_from_env()
+app.config["FEED_PAGE_SIZE"] = int(os.environ.get("FEED_PAGE_SIZE", 50))
+app.config["FEED_MAX_PAGE_SIZE"] = 200
+# users per page in the admin user sections and the user search endpoint
+app.config["ADMIN_PAGE_SIZE"] = int(os.environ.get("ADMIN_PAGE_SIZE", 50))
+# most bookings one bulk or recurring request may create
+app.config["BULK_MAX_BOOKINGS"] = int(os.environ.get("BULK_MAX_BOOKINGS", 366))
+# how far ahead the "upcoming" feed filter looks
+app.config["UPCOMING_DAYS"] = int(os.environ.get("UPCOMING_DAYS", 7))
+# log requests slower than this many milliseconds, with their SQL; unset to disable
+app.config["SLOW_REQUEST_MS"] = float(os.environ.get("SLOW_REQUEST_MS", 0)) or None
+# fragment cache backend, see cache.py; use sqlite:/// when running several workers or processes
+app.config["CACHE_URL"] = os.environ.get("CACHE_URL", "memory://")
+app.config["CACHE_MAX_ENTRIES"] = int(os.environ.get("CACHE_MAX_ENTRIES", 256))
+# seconds a worker may reuse the logged-in user's id/role/name without asking the DB
+app.config["PRINCIPAL_TTL"] = float(os.environ.get("PRINCIPAL_TTL", 30))
+# live status broker, see events.py; memory:// only reaches streams served by the same worker
+app.config["EVENTS_URL"] = os.environ.get("EVENTS_URL", "memory://")
+# a stream ends after this long and the browser reconnects, so workers aren't held forever
+app.config["SSE_MAX_SECONDS"] = int(os.environ.get("SSE_MAX_SECONDS", 300))
+# each open stream holds a server thread, so cap them below the thread count (see Procfile)
+# and keep the rest for ordinary requests; browsers over the cap retry later
+app.config["SSE_MAX_STREAMS"] = int(os.environ.get("SSE_MAX_STREAMS", 48))
+# background jobs, see jobs.py: retries back off from JOBS_BACKOFF_SECONDS and stop after JOBS_MAX_ATTEMPTS
+app.config["JOBS_MAX_ATTEMPTS"] = int(os.environ.get("JOBS_MAX_ATTEMPTS", 8))
+app.config["JOBS_BACKOFF_SECONDS"] = float(os.environ.get("JOBS_BACKOFF_SECONDS", 30))
+# notification sender, see notify.py
+app.config["NOTIFY_URL"] = os.environ.get("NOTIFY_URL", "log://")
+# a recipient's notifications are held this long so they go out as one message
+app.config["NOTIFY_BATCH_SECONDS"] = float(os.environ.get("NOTIFY_BATCH_SECONDS", 60))
+
+db = SQLAlchemy(app, session_options={"class_": database.RoutingSession})
+database.init_app(app, db)
+metrics.init_app(app)
+assets.init_app(app)
+fragments = cache.from_url(app.config["CACHE_URL"], app.config["CACHE_MAX_ENTRIES"])
+principals = cache.TTLCache(app.config["PRINCIPAL_TTL"])
+booking_events = events.from_url(app.config["EVENTS_URL"])
+notifier = notify.from_url(app.config["NOTIFY_URL"])
+event_streams = threading.BoundedSemaphore(app.config["SSE_MAX_STREAMS"])
 
 # ---------------- MODELS ---------------- #
 class User(db.Model):
+    __table_args__ = (db.Index("ix_user_role", "role"),)
+
     id = db.Column(db.Integer, primary_key=True)
     role = db.Column(db.String(20))
     name = db.Column(db.String(100))
@@ -32,19 +112,46 @@ class User(db.Model):
 
 
 class Booking(db.Model):
+    __table_args__ = (
+        db.Index("ix_booking_service_type_id", "service_type", "id"),
+        db.Index("ix_booking_landowner_id", "landowner_id"),
+        db.Index("ix_booking_service_date", "service_date"),
+        db.Index("ix_booking_end_date", "end_date"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     landowner_id = db.Column(db.Integer, db.ForeignKey("user.id"))
-    service_date = db.Column(db.String(50))
+    service_date = db.Column(db.Date)
     days = db.Column(db.Integer)
+    end_date = db.Column(db.Date)  # last day of work, kept by set_end_date()
     service_type = db.Column(db.String(20))
     num_labor = db.Column(db.Integer)
     machine_type = db.Column(db.String(100))
+    skill = db.Column(db.String(100))  # optional skill asked of laborers
     labor_status = db.Column(db.String(100), default="Pending")
     machinery_status = db.Column(db.String(100), default="Pending")
     action = db.Column(db.String(20), default="Pending")  # Pending/Closed
+    # response counters, kept in step with BookingResponse by record_response()
+    labor_accepted = db.Column(db.Integer, default=0, nullable=False)
+    labor_rejected = db.Column(db.Integer, default=0, nullable=False)
+    machinery_accepted = db.Column(db.Integer, default=0, nullable=False)
+    machinery_rejected = db.Column(db.Integer, default=0, nullable=False)
+    # how many users the booking was routed to; "Rejected" means rejected by all of them
+    labor_pool = db.Column(db.Integer, default=0, nullable=False)
+    machinery_pool = db.Column(db.Integer, default=0, nullable=False)
+    # when the booking was made and when each side was confirmed, for time-to-confirm rollups
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    labor_confirmed_at = db.Column(db.DateTime)
+    machinery_confirmed_at = db.Column(db.DateTime)
 
 
 class BookingResponse(db.Model):
+    __table_args__ = (
+        db.Index("uq_booking_response_booking_user", "booking_id", "user_id", unique=True),
+        db.Index("ix_booking_response_booking_role_response", "booking_id", "user_role", "response"),
+        db.Index("ix_booking_response_user_booking", "user_id", "booking_id"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     booking_id = db.Column(db.Integer, db.ForeignKey("booking.id"))
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"))
@@ -52,15 +159,1087 @@ class BookingResponse(db.Model):
     user_role = db.Column(db.String(20))  # labor or machinery
 
 
+class BookingEligibility(db.Model):
+    """A booking routed to a laborer or machinery owner (see matching.py)."""
+    __table_args__ = (db.Index("ix_booking_eligibility_booking", "booking_id"),)
+
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), primary_key=True)
+    booking_id = db.Column(db.Integer, db.ForeignKey("booking.id"), primary_key=True)
+
+
+class BookingRollup(db.Model):
+    """Demand and fill totals per district, service month, service type and machine type.
+
+    Kept up to date by create_bookings() and record_response(); rebuild_rollups()
+    recomputes it from the live and archived bookings.
+    """
+    district = db.Column(db.String(100), primary_key=True)
+    month = db.Column(db.String(7), primary_key=True)  # YYYY-MM of service_date
+    service_type = db.Column(db.String(20), primary_key=True)
+    machine_type = db.Column(db.String(100), primary_key=True)  # "" unless a machine was asked for
+    bookings = db.Column(db.Integer, default=0, nullable=False)
+    labor_requested = db.Column(db.Integer, default=0, nullable=False)
+    labor_accepted = db.Column(db.Integer, default=0, nullable=False)
+    labor_rejected = db.Column(db.Integer, default=0, nullable=False)
+    labor_confirmed = db.Column(db.Integer, default=0, nullable=False)
+    labor_confirm_seconds = db.Column(db.Float, default=0, nullable=False)
+    labor_confirm_samples = db.Column(db.Integer, default=0, nullable=False)  # confirmations with both timestamps
+    machinery_requested = db.Column(db.Integer, default=0, nullable=False)
+    machinery_rejected = db.Column(db.Integer, default=0, nullable=False)
+    machinery_confirmed = db.Column(db.Integer, default=0, nullable=False)
+    machinery_confirm_seconds = db.Column(db.Float, default=0, nullable=False)
+    machinery_confirm_samples = db.Column(db.Integer, default=0, nullable=False)
+
+
+class Job(db.Model):
+    """A background job, see jobs.py."""
+    __table_args__ = (
+        db.Index("ix_job_status_run_at", "status", "run_at"),
+        # at most one queued job per key; see jobs.Queue.enqueue
+        db.Index("uq_job_queued_key", "key", unique=True, sqlite_where=db.text("status = 'queued'")),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    key = db.Column(db.String(200))
+    status = db.Column(db.String(20), nullable=False)  # queued/running/done/dead/superseded
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    run_at = db.Column(db.DateTime, nullable=False)
+    locked_by = db.Column(db.String(100))
+    locked_until = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False)
+
+
+class Notification(db.Model):
+    """Something to tell a user; a user's pending notifications are sent together by deliver_notifications()."""
+    __table_args__ = (
+        db.Index("uq_notification_user_kind_booking", "user_id", "kind", "booking_id", unique=True),
+        db.Index("ix_notification_user_sent", "user_id", "sent_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    booking_id = db.Column(db.Integer, nullable=False)  # no foreign key: the booking may be archived
+    kind = db.Column(db.String(30), nullable=False)  # booking_created, labor_confirmed, machinery_confirmed
+    created_at = db.Column(db.DateTime, nullable=False)
+    sent_at = db.Column(db.DateTime)
+
+
+def end_date_for(service_date, days):
+    """Last working day of a booking starting on ``service_date`` for ``days`` days."""
+    if service_date is None:
+        return None
+    return service_date + timedelta(days=max(int(days or 1), 1) - 1)
+
+
+@event.listens_for(Booking, "before_insert")
+@event.listens_for(Booking, "before_update")
+def set_end_date(mapper, connection, target):
+    target.end_date = end_date_for(target.service_date, target.days)
+
+
+def archive_table(table, primary_key):
+    """Copy of ``table``'s columns, without foreign keys, plus when each row was archived."""
+    return db.Table(
+        f"{table.name}_archive", db.metadata,
+        *[db.Column(c.name, c.type, primary_key=c.name in primary_key) for c in table.columns],
+        db.Column("archived_at", db.DateTime, nullable=False),
+    )
+
+
+# finished bookings and their responses, moved out of the hot tables by archive_bookings();
+# (booking_id, user_id) keys the responses because live response ids can be reused
+booking_archive = archive_table(Booking.__table__, ["id"])
+booking_response_archive = archive_table(BookingResponse.__table__, ["booking_id", "user_id"])
+
+
 # ---------------- HELPERS ---------------- #
+# what the routes need to know about whoever is logged in
+Principal = namedtuple("Principal", "id role name username address")
+
+
 def current_user():
-    uid = session.get("user_id")
-    return User.query.get(uid) if uid else None
+    """The logged-in ``Principal``, looked up at most once per request."""
+    if "principal" not in g:
+        uid = session.get("user_id")
+        g.principal = load_principal(uid) if uid else None
+    return g.principal
+
+
+def load_principal(uid):
+    principal = principals.get(uid)
+    if principal is None:
+        u = User.query.get(uid)
+        if u is None:
+            return None
+        principal = Principal(u.id, u.role, u.name, u.username, u.address)
+        principals.set(uid, principal)
+    return principal
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def forget_principal(mapper, connection, target):
+    # other workers catch up within PRINCIPAL_TTL
+    principals.pop(target.id)
+
+
+COUNTER_COLUMNS = ("labor_accepted", "labor_rejected", "machinery_accepted", "machinery_rejected")
 
 
 @app.before_first_request
 def setup():
     db.create_all()
+    # create_all() never alters existing tables; migrations.py does
+    if migrations.upgrade(db.engine):
+        # schema changes may have added or deduplicated what the derived columns summarize
+        rebuild_eligibility()
+        reconcile_counters()
+        rebuild_rollups()
+
+
+@app.cli.command("build-assets")
+def build_assets_command():
+    """Fingerprint, precompress and resize everything under static/ into static/dist/."""
+    manifest = assets.build(app.static_folder, log=click.echo)
+    click.echo(f"{len(manifest)} asset(s) in {os.path.join(app.static_folder, assets.DIST)}")
+
+
+@app.cli.command("migrate")
+@click.option("--explain/--no-explain", default=True, help="Print EXPLAIN QUERY PLAN before and after.")
+def migrate_command(explain):
+    """Create missing tables and apply pending schema migrations."""
+    before = migrations.explain(db.engine) if explain else {}
+    db.create_all()
+    applied = migrations.upgrade(db.engine, echo=click.echo)
+    if applied:
+        rebuild_eligibility()
+        reconcile_counters()
+        rebuild_rollups()
+    with db.engine.connect() as conn:
+        click.echo(f"schema version {migrations.current_version(conn)}" + ("" if applied else " (up to date)"))
+    if explain:
+        after = migrations.explain(db.engine)
+        for name, plan in after.items():
+            click.echo(f"\n{name}")
+            click.echo("  before: " + "; ".join(before.get(name) or ["(table missing)"]))
+            click.echo("  after:  " + "; ".join(plan))
+
+
+def bump(*entities):
+    """Invalidate cached fragments built from ``entities``. Call after the commit."""
+    for name in entities:
+        fragments.incr(name)
+
+
+def bump_bookings(*landowner_ids):
+    """bump() after bookings of ``landowner_ids`` changed: every booking view, and those landowners' own."""
+    bump("bookings", *{f"landowner:{i}" for i in landowner_ids})
+
+
+def check_shared_cache(keeps_running=False):
+    """Make sure a CLI command's bump() reaches the web workers.
+
+    Their versions live in CACHE_URL, and memory:// keeps them inside this
+    process, so the workers would go on serving cached sections and 304s.
+    A long-running process refuses to start; a one-off command warns.
+    """
+    if not isinstance(fragments, cache.MemoryCache):
+        return
+    message = ("CACHE_URL is memory://, so running web workers won't see this command's changes; "
+               "give every process the same sqlite:/// CACHE_URL (see Procfile)")
+    if keeps_running:
+        raise click.UsageError(message)
+    click.echo(f"warning: {message}, or restart them afterwards", err=True)
+
+
+def bump_all_bookings():
+    """bump() after rewriting bookings in bulk, when it isn't worth working out whose."""
+    bump("bookings", "bookings:rebuilt")
+
+
+# ---------------- BOOKING STATUS ---------------- #
+def response_stats(booking_ids):
+    """Accept/Reject counts recounted from BookingResponse, keyed by booking id.
+
+    ``booking_ids`` can be a list of ids or a ``select`` of ids; the work is one
+    grouped query. Dashboards read the counters on Booking instead, this is for
+    reconciliation.
+    """
+    stats = {}
+    if isinstance(booking_ids, (list, tuple, set)) and not booking_ids:
+        return stats
+
+    counts = (
+        db.session.query(BookingResponse.booking_id, BookingResponse.user_role,
+                         BookingResponse.response, db.func.count(BookingResponse.id))
+        .filter(BookingResponse.booking_id.in_(booking_ids))
+        .group_by(BookingResponse.booking_id, BookingResponse.user_role, BookingResponse.response)
+    )
+    for booking_id, role, response, n in counts:
+        column = counter_column(role, response)
+        if column:
+            stats.setdefault(booking_id, dict.fromkeys(COUNTER_COLUMNS, 0))[column] = n
+    return stats
+
+
+def accepted_names(booking_ids, role):
+    """{booking_id: [names of users who accepted]} for one role, in response order."""
+    names = {}
+    if isinstance(booking_ids, (list, tuple, set)) and not booking_ids:
+        return names
+    rows = (
+        db.session.query(BookingResponse.booking_id, User.name)
+        .join(User, User.id == BookingResponse.user_id)
+        .filter(BookingResponse.booking_id.in_(booking_ids),
+                BookingResponse.user_role == role, BookingResponse.response == "Accept")
+        .order_by(BookingResponse.id)
+    )
+    for booking_id, name in rows:
+        names.setdefault(booking_id, []).append(name)
+    return names
+
+
+def counter_column(role, response):
+    """Booking counter bumped by a response, or None if the response isn't counted."""
+    if role not in ("labor", "machinery") or response not in ("Accept", "Reject"):
+        return None
+    return f"{role}_{'accepted' if response == 'Accept' else 'rejected'}"
+
+
+def is_closed(status):
+    return status.startswith("Confirmed") or status == "Rejected"
+
+
+def booking_status(b, names=None):
+    """labor_status / machinery_status / action for one booking from its counters.
+
+    Accepted names only appear in "Confirmed (...)" and never change once a
+    side is confirmed, so without ``names`` the stored confirmed text is reused.
+    """
+    stype = (b.service_type or "").strip().lower()
+    num_labor = int(b.num_labor) if b.num_labor else 0
+    labor_accepted, labor_rejected = b.labor_accepted or 0, b.labor_rejected or 0
+    mach_accepted, mach_rejected = b.machinery_accepted or 0, b.machinery_rejected or 0
+
+    # ---- labor status ----
+    if stype in ("labor", "both") and num_labor > 0:
+        if labor_accepted >= num_labor:
+            labor_status = _confirmed(b.labor_status, names and names.get("labor"))
+        elif labor_rejected >= b.labor_pool and b.labor_pool > 0:
+            labor_status = "Rejected"
+        else:
+            labor_status = f"{labor_accepted}/{num_labor} Accepted"
+    else:
+        labor_status = "N/A"
+
+    # ---- machinery status ----
+    if stype in ("machinery", "both"):
+        # machinery considered confirmed when at least one accepts
+        if mach_accepted > 0:
+            machinery_status = _confirmed(b.machinery_status, names and names.get("machinery"))
+        elif mach_rejected >= b.machinery_pool and b.machinery_pool > 0:
+            machinery_status = "Rejected"
+        else:
+            machinery_status = "Pending"
+    else:
+        machinery_status = "N/A"
+
+    # ---- overall action ----
+    if stype == "both":
+        action = "Closed" if (is_closed(labor_status) and is_closed(machinery_status)) else "Pending"
+    elif stype == "labor":
+        action = "Closed" if is_closed(labor_status) else "Pending"
+    elif stype == "machinery":
+        action = "Closed" if is_closed(machinery_status) else "Pending"
+    else:
+        action = "Pending"
+
+    return {"labor_status": labor_status, "machinery_status": machinery_status, "action": action}
+
+
+def _confirmed(stored, names):
+    if names is None and stored and stored.startswith("Confirmed"):
+        return stored
+    return f"Confirmed ({', '.join(names or [])})"
+
+
+def booking_statuses(bookings):
+    """Status for every booking in ``bookings``, computed from the rows alone."""
+    return {b.id: booking_status(b) for b in bookings}
+
+
+def refresh_booking_status(b, names=None):
+    """Recompute and store ``b``'s status columns. The caller commits.
+
+    ``names`` ({role: [accepted names]}) saves the lookup when the caller
+    already has them. Returns the names used.
+    """
+    if names is None:
+        names = {}
+        if b.num_labor and (b.labor_accepted or 0) >= int(b.num_labor):
+            names["labor"] = accepted_names([b.id], "labor").get(b.id, [])
+        if b.machinery_accepted:
+            names["machinery"] = accepted_names([b.id], "machinery").get(b.id, [])
+    status = booking_status(b, names)
+    b.labor_status = status["labor_status"]
+    b.machinery_status = status["machinery_status"]
+    b.action = status["action"]
+    return names
+
+
+def labor_row_status(b):
+    """accepted_count / status / open_for_more as the labor feed shows them."""
+    accepted_count = b.labor_accepted or 0
+    needed = int(b.num_labor) if b.num_labor else 0
+    if needed > 0:
+        if accepted_count >= needed:
+            status = "Confirmed"
+        elif (b.labor_rejected or 0) >= b.labor_pool and b.labor_pool > 0:
+            status = "Rejected"
+        else:
+            status = f"{accepted_count}/{needed} Accepted"
+    else:
+        # shouldn't normally happen, fallback
+        status = "Pending"
+    return {"accepted_count": accepted_count, "status": status,
+            "open_for_more": not (needed > 0 and accepted_count >= needed)}
+
+
+def machinery_row_status(b, names=()):
+    """accepted_names / status / open_for_more as the machinery feed shows them."""
+    # requirement: for machinery we consider confirmed if at least one accepts
+    if (b.machinery_accepted or 0) > 0:
+        status, open_for_more = "Confirmed", False
+    elif (b.machinery_rejected or 0) >= b.machinery_pool and b.machinery_pool > 0:
+        status, open_for_more = "Rejected", False
+    else:
+        status, open_for_more = "Pending", True
+    return {"accepted_names": list(names), "status": status, "open_for_more": open_for_more}
+
+
+def booking_event(b, names):
+    """Everything a dashboard needs to patch one booking's row in place."""
+    return {
+        "id": b.id,
+        "landowner_id": b.landowner_id,
+        "landowner": {"labor_status": b.labor_status, "machinery_status": b.machinery_status, "action": b.action},
+        "labor": labor_row_status(b),
+        "machinery": machinery_row_status(b, names.get("machinery", [])),
+    }
+
+
+class SlotTaken(Exception):
+    """An Accept arrived after the booking's last slot for that role was filled."""
+
+
+class Busy(Exception):
+    """An Accept overlaps a booking the worker already accepted; args[0] is that booking's id."""
+
+
+def calendar_for(user, since=None, excluding=None):
+    """``user``'s availability.Calendar, from the bookings they accepted that end on or after ``since``."""
+    q = (
+        db.session.query(Booking.service_date, Booking.end_date, Booking.id)
+        .join(BookingResponse, BookingResponse.booking_id == Booking.id)
+        .filter(BookingResponse.user_id == user.id, BookingResponse.response == "Accept")
+    )
+    if since is not None:
+        q = q.filter(Booking.end_date >= since)
+    if excluding is not None:
+        q = q.filter(Booking.id != excluding)
+    return availability.Calendar(q)
+
+
+def has_free_slot(role):
+    """SQL condition: the booking can still take one more acceptance from ``role``."""
+    if role == "labor":
+        # a labor booking without a headcount never fills up (see labor_row_status)
+        return db.or_(Booking.num_labor.is_(None), Booking.num_labor <= 0,
+                      Booking.labor_accepted < Booking.num_labor)
+    return Booking.machinery_accepted == 0
+
+
+def record_response(booking, user, response, role):
+    """Save a response and update the booking's counters and status in the same transaction.
+
+    The counter is bumped with one conditional UPDATE, so racing workers can't
+    accept past capacity: the loser's UPDATE matches no row and SlotTaken is
+    raised after rolling back. A second response from the same user fails on
+    the unique index with IntegrityError. An Accept overlapping one of the
+    user's accepted bookings raises Busy; the check runs after the insert
+    holds SQLite's write lock, so two tabs can't both get through.
+    """
+    db.session.add(BookingResponse(booking_id=booking.id, user_id=user.id, response=response, user_role=role))
+    db.session.flush()
+    if response == "Accept":
+        busy_with = calendar_for(user, since=booking.service_date, excluding=booking.id).conflict(
+            booking.service_date, booking.end_date)
+        if busy_with:
+            db.session.rollback()
+            raise Busy(busy_with)
+    column = counter_column(role, response)
+    if column:
+        condition = has_free_slot(role) if response == "Accept" else db.true()
+        updated = Booking.query.filter(Booking.id == booking.id, condition).update(
+            {column: getattr(Booking, column) + 1}, synchronize_session=False)
+        if not updated:
+            db.session.rollback()
+            raise SlotTaken(booking.id)
+        # other workers may have moved the counters since ``booking`` was loaded
+        db.session.refresh(booking)
+    was_confirmed = confirmed_sides(booking)
+    names = refresh_booking_status(booking)
+    confirmed = confirmed_sides(booking) - was_confirmed
+    rollup_response(booking, role, response, confirmed)
+    for side in confirmed:
+        job_queue.enqueue("booking_confirmed", {"booking_id": booking.id, "side": side},
+                          key=f"booking_confirmed:{booking.id}:{side}")
+    db.session.commit()
+    bump_bookings(booking.landowner_id)
+    event = booking_event(booking, names)
+    booking_events.publish(event)
+    return event
+
+
+ALREADY_RESPONDED = {"labor": "You have already responded to this booking!", "machinery": "You have already responded!"}
+SLOT_TAKEN = {"labor": "All labor slots for this booking are already taken", "machinery": "Another machine was already accepted for this booking"}
+
+
+def respond(user, role, booking_id, response):
+    """Check and record a worker's Accept/Reject.
+
+    Returns (HTTP status, reason, message, booking event or None); ``reason``
+    tells the 409s apart: "responded", "closed" or "busy".
+    """
+    if response not in ("Accept", "Reject"):
+        return 400, "invalid", "Response must be Accept or Reject", None
+    booking = Booking.query.get(booking_id)
+    if not booking:
+        return 404, "not_found", "Booking not found", None
+    if not BookingEligibility.query.get((user.id, booking_id)):
+        return 403, "not_routed", "This booking isn't open to you", None
+    # the unique (booking_id, user_id) index prevents double response
+    try:
+        event = record_response(booking, user, response, role)
+    except IntegrityError:
+        db.session.rollback()
+        return 409, "responded", ALREADY_RESPONDED[role], None
+    except SlotTaken:
+        return 409, "closed", SLOT_TAKEN[role], None
+    except Busy as e:
+        return 409, "busy", f"You're already booked on those dates (booking {e.args[0]})", None
+    return 200, "responded", f"You {response.lower()}ed booking {booking_id}", event
+
+
+def flash_response(status, message):
+    flash(message, {200: "success", 409: "info"}.get(status, "danger"))
+
+
+def reconcile_counters(fix=True):
+    """Rebuild every booking's counters and status from BookingResponse.
+
+    Returns the ids of bookings whose stored counters had drifted.
+    """
+    stats = response_stats(db.select(Booking.id))
+    names = {role: accepted_names(db.select(Booking.id), role) for role in ("labor", "machinery")} if fix else {}
+    drifted = []
+    for b in Booking.query.yield_per(500):
+        actual = stats.get(b.id) or dict.fromkeys(COUNTER_COLUMNS, 0)
+        if any((getattr(b, c) or 0) != actual[c] for c in COUNTER_COLUMNS):
+            drifted.append(b.id)
+        if fix:
+            for c in COUNTER_COLUMNS:
+                setattr(b, c, actual[c])
+            refresh_booking_status(b, {role: names[role].get(b.id, []) for role in names})
+    if fix:
+        db.session.commit()
+        bump_all_bookings()
+    return drifted
+
+
+@app.cli.command("reconcile-counters")
+@click.option("--check", is_flag=True, help="Only report drift, don't rewrite anything.")
+def reconcile_counters_command(check):
+    """Rebuild booking response counters and stored statuses."""
+    if not check:
+        check_shared_cache()
+    setup()
+    drifted = reconcile_counters(fix=not check)
+    verb = "Found" if check else "Fixed"
+    click.echo(f"{verb} {len(drifted)} booking(s) with drifted counters" + (f": {drifted}" if drifted else ""))
+
+
+def users_by_id(user_ids):
+    """{id: user} for the given ids (list or ``select``) in one query."""
+    if isinstance(user_ids, (list, tuple)):
+        user_ids = set(user_ids)
+    return {u.id: u for u in User.query.filter(User.id.in_(user_ids))}
+
+
+def user_names(user_ids):
+    """{id: name} for display, from cached principals where possible and one query for the rest."""
+    names, missing = {}, set()
+    for uid in set(user_ids):
+        principal = principals.get(uid)
+        if principal is None:
+            missing.add(uid)
+        else:
+            names[uid] = principal.name
+    if missing:
+        names.update(db.session.query(User.id, User.name).filter(User.id.in_(missing)))
+    return names
+
+
+# ---------------- MATCHING ---------------- #
+# per-process index of who can take which booking; see matching.py
+eligibility = matching.EligibilityIndex()
+
+
+def sync_eligibility():
+    """Index users registered since the last sync, in this worker or any other."""
+    for u in User.query.filter(User.id > eligibility.last_user_id).order_by(User.id):
+        eligibility.add(u)
+
+
+def _route(b, landowner):
+    # set b's pools from the index and return its BookingEligibility rows
+    pools = eligibility.eligible(b, landowner.address if landowner else None)
+    b.labor_pool = len(pools["labor"])
+    b.machinery_pool = len(pools["machinery"])
+    return [{"user_id": uid, "booking_id": b.id} for ids in pools.values() for uid in ids]
+
+
+def bookings_for_new_user(user):
+    """Open bookings that haven't ended yet and that a worker who is about to register matches.
+
+    Only reads, so call it before the user is added: the write transaction
+    (and SQLite's write lock) then only covers the inserts in route_new_user.
+    Finished bookings are left alone, so the cost follows what is still to
+    come rather than the whole history.
+    """
+    if user.role == "labor":
+        still_open = db.and_(Booking.service_type.in_(["labor", "both"]), labor_open_for_more())
+    elif user.role == "machinery":
+        still_open = db.and_(Booking.service_type.in_(["machinery", "both"]), Booking.machinery_accepted == 0)
+    else:
+        return []
+    bookings = Booking.query.filter(still_open, Booking.end_date >= date.today()).all()
+    owners = users_by_id([b.landowner_id for b in bookings])
+    return [b for b in bookings if matching.matches(user, b, getattr(owners.get(b.landowner_id), "address", None))]
+
+
+def route_new_user(user, matched):
+    """Route a newly registered worker to ``matched`` (see bookings_for_new_user). The caller commits."""
+    if not matched:
+        return
+    pool = f"{user.role}_pool"
+    db.session.execute(db.insert(BookingEligibility), [{"user_id": user.id, "booking_id": b.id} for b in matched])
+    # "fetch" reads the new pools back with RETURNING instead of reloading each booking
+    Booking.query.filter(Booking.id.in_([b.id for b in matched])).update(
+        {pool: getattr(Booking, pool) + 1}, synchronize_session="fetch")
+    for b in matched:
+        # a bigger pool can only take a side out of "Rejected"; confirmed text is kept as stored
+        status = booking_status(b)
+        b.labor_status, b.machinery_status, b.action = status["labor_status"], status["machinery_status"], status["action"]
+
+
+def rebuild_eligibility():
+    """Re-route every booking from scratch, e.g. after the matching rules change."""
+    BookingEligibility.query.delete()
+    sync_eligibility()
+    owners = users_by_id(db.select(Booking.landowner_id))
+    rows = []
+    for b in Booking.query.yield_per(1000):
+        rows.extend(_route(b, owners.get(b.landowner_id)))
+        if len(rows) >= 10000:
+            db.session.execute(db.insert(BookingEligibility), rows)
+            rows = []
+    if rows:
+        db.session.execute(db.insert(BookingEligibility), rows)
+    db.session.commit()
+    bump_all_bookings()
+
+
+@app.cli.command("rebuild-eligibility")
+def rebuild_eligibility_command():
+    """Recompute which workers every booking is routed to, then the statuses that depend on it."""
+    check_shared_cache()
+    setup()
+    rebuild_eligibility()
+    reconcile_counters()
+    click.echo(f"Routed {Booking.query.count()} booking(s) to {BookingEligibility.query.count()} worker slot(s)")
+
+
+# ---------------- NEW BOOKINGS ---------------- #
+SERVICE_TYPES = ("labor", "machinery", "both")
+
+
+def booking_fields(item):
+    """Validated Booking columns from one form or JSON item: ``(fields, errors)``."""
+    fields, errors = {}, {}
+    try:
+        fields["service_date"] = date.fromisoformat(str(item.get("service_date") or ""))
+    except ValueError:
+        errors["service_date"] = "Invalid service date"
+    fields["days"] = positive_int(item.get("days"))
+    if not fields["days"]:
+        errors["days"] = "Days must be a whole number of at least 1"
+    fields["service_type"] = str(item.get("service_type") or "").strip().lower()
+    if fields["service_type"] not in SERVICE_TYPES:
+        errors["service_type"] = "Service type must be labor, machinery or both"
+    fields["num_labor"] = None
+    if fields["service_type"] in ("labor", "both"):
+        fields["num_labor"] = positive_int(item.get("num_labor"))
+        if not fields["num_labor"]:
+            errors["num_labor"] = "Number of labors must be at least 1"
+    for name, label in (("machine_type", "Machine type"), ("skill", "Skill")):
+        fields[name] = item.get(name) or None
+        if fields[name] is not None and not isinstance(fields[name], str):
+            errors[name] = f"{label} must be text"
+    return fields, errors
+
+
+def positive_int(value):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value >= 1 else None
+
+
+def recurring_items(template, every_days, count):
+    """``count`` copies of ``template``, the first on its service_date and then every ``every_days`` days."""
+    every_days, count = positive_int(every_days), positive_int(count)
+    if not every_days or not count:
+        raise ValueError("Repeat needs every_days and count of at least 1")
+    if count > app.config["BULK_MAX_BOOKINGS"]:
+        raise ValueError(f"At most {app.config['BULK_MAX_BOOKINGS']} bookings per request")
+    try:
+        start = date.fromisoformat(str(template.get("service_date") or ""))
+    except ValueError:
+        raise ValueError("Invalid service date")
+    return [dict(template, service_date=(start + timedelta(days=i * every_days)).isoformat()) for i in range(count)]
+
+
+def create_bookings(landowner, items):
+    """Validate every item, then insert them all, routed, in one transaction.
+
+    Returns ``(created, results)`` with one result per item, in order:
+    ``{"index", "ok", "id"}`` or ``{"index", "ok", "errors"}``. If any item
+    is invalid nothing is written. The bookings go in as one batched INSERT
+    and their routing as one executemany, so a season of bookings costs
+    about what a single one does. Telling the matched workers is left to a
+    background job.
+    """
+    checked = [booking_fields(item) for item in items]
+    if not items or any(errors for _, errors in checked):
+        return False, [{"index": i, "ok": not errors, "errors": errors} for i, (_, errors) in enumerate(checked)]
+
+    sync_eligibility()
+    bookings, pools = [], []
+    now = datetime.utcnow()
+    for fields, _ in checked:
+        b = Booking(landowner_id=landowner.id, created_at=now, **fields)
+        pool = eligibility.eligible(b, landowner.address)
+        b.labor_pool, b.machinery_pool = len(pool["labor"]), len(pool["machinery"])
+        refresh_booking_status(b, names={})  # nobody has responded yet
+        bookings.append(b)
+        pools.append(pool)
+    db.session.add_all(bookings)
+    db.session.flush()
+    rows = [{"user_id": uid, "booking_id": b.id} for b, pool in zip(bookings, pools) for ids in pool.values()
+            for uid in ids]
+    if rows:
+        db.session.execute(db.insert(BookingEligibility), rows)
+    totals = defaultdict(Counter)
+    for b in bookings:
+        totals[rollup_key(b, landowner.address)].update(booking_totals(b))
+    add_to_rollups(totals)
+    job_queue.enqueue("booking_created", {"booking_ids": [b.id for b in bookings]},
+                      key=f"booking_created:{bookings[0].id}")
+    db.session.commit()
+    bump_bookings(landowner.id)
+    return True, [{"index": i, "ok": True, "id": b.id} for i, b in enumerate(bookings)]
+
+
+# ---------------- ARCHIVE ---------------- #
+def archive_bookings(ended_before, batch=500):
+    """Move closed bookings that ended before ``ended_before`` and their responses to the archive tables.
+
+    Works in batches of ``batch`` bookings, one short transaction each.
+    The newest booking is never moved, so SQLite can't hand its id out again.
+    Returns how many bookings were archived.
+    """
+    newest = db.select(db.func.max(Booking.id)).scalar_subquery()
+    moved, owners = 0, set()
+    while True:
+        rows = db.session.query(Booking.id, Booking.landowner_id).filter(
+            Booking.end_date < ended_before, Booking.action == "Closed", Booking.id < newest
+        ).order_by(Booking.id).limit(batch).all()
+        if not rows:
+            break
+        ids = [booking_id for booking_id, _ in rows]
+        owners.update(landowner_id for _, landowner_id in rows)
+        now = db.literal(datetime.utcnow(), db.DateTime)
+        for live, archive, booking_id in ((Booking.__table__, booking_archive, Booking.id),
+                                          (BookingResponse.__table__, booking_response_archive,
+                                           BookingResponse.booking_id)):
+            db.session.execute(archive.insert().from_select(
+                [c.name for c in live.columns] + ["archived_at"],
+                db.select(*live.columns, now).where(booking_id.in_(ids))))
+        BookingEligibility.query.filter(BookingEligibility.booking_id.in_(ids)).delete(synchronize_session=False)
+        BookingResponse.query.filter(BookingResponse.booking_id.in_(ids)).delete(synchronize_session=False)
+        Booking.query.filter(Booking.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        moved += len(ids)
+    if moved:
+        bump_bookings(*owners)
+    return moved
+
+
+@app.cli.command("archive-bookings")
+@click.option("--days", default=0, show_default=True, help="Keep bookings until this many days after they end.")
+@click.option("--batch", default=500, show_default=True, help="Bookings moved per transaction.")
+@click.option("--every", type=int, help="Keep running, archiving every this many seconds (e.g. as a Procfile process).")
+def archive_bookings_command(days, batch, every):
+    """Move finished, closed bookings and their responses into the archive tables."""
+    check_shared_cache(keeps_running=bool(every))
+    setup()
+    while True:
+        moved = archive_bookings(date.today() - timedelta(days=days), batch)
+        click.echo(f"Archived {moved} booking(s)")
+        if not every:
+            break
+        time.sleep(every)
+
+
+# ---------------- ANALYTICS ---------------- #
+ROLLUP_KEY = ("district", "month", "service_type", "machine_type")
+ROLLUP_TOTALS = [c.name for c in BookingRollup.__table__.columns if c.name not in ROLLUP_KEY]
+
+
+def district_of(address):
+    """Last place in an address, e.g. "Pollachi" for "12, Gandhi Nagar, Pollachi"."""
+    parts = [" ".join(part.split()).title() for part in (address or "").split(",")]
+    parts = [part for part in parts if part and not part.isdigit()]
+    return parts[-1] if parts else ""
+
+
+def rollup_key(b, address):
+    """booking_rollup key of a booking, or archived booking row, whose landowner lives at ``address``."""
+    stype = (b.service_type or "").strip().lower()
+    machine = " ".join((b.machine_type or "").split()).lower() if stype in ("machinery", "both") else ""
+    return district_of(address), b.service_date.strftime("%Y-%m") if b.service_date else "", stype, machine
+
+
+def confirmed_sides(b):
+    return {side for side in ("labor", "machinery") if (getattr(b, f"{side}_status") or "").startswith("Confirmed")}
+
+
+def confirmed_totals(side, created_at, confirmed_at):
+    totals = {f"{side}_confirmed": 1}
+    if created_at and confirmed_at:
+        totals[f"{side}_confirm_seconds"] = (confirmed_at - created_at).total_seconds()
+        totals[f"{side}_confirm_samples"] = 1
+    return totals
+
+
+def booking_totals(b):
+    """What one booking, as it stands now, adds to its rollup row."""
+    stype = (b.service_type or "").strip().lower()
+    totals = {"bookings": 1}
+    if stype in ("labor", "both"):
+        totals.update(labor_requested=int(b.num_labor or 0), labor_accepted=b.labor_accepted or 0,
+                      labor_rejected=b.labor_rejected or 0)
+    if stype in ("machinery", "both"):
+        totals.update(machinery_requested=1, machinery_rejected=b.machinery_rejected or 0)
+    for side in confirmed_sides(b):
+        totals.update(confirmed_totals(side, b.created_at, getattr(b, f"{side}_confirmed_at")))
+    return totals
+
+
+def add_to_rollups(totals):
+    """Add ``{key: {column: amount}}`` to booking_rollup in one executemany upsert. The caller commits."""
+    if not totals:
+        return
+    table = BookingRollup.__table__
+    upsert = sqlite_insert(table)
+    upsert = upsert.on_conflict_do_update(index_elements=ROLLUP_KEY,
+                                          set_={c: table.c[c] + upsert.excluded[c] for c in ROLLUP_TOTALS})
+    db.session.execute(upsert, [{**dict(zip(ROLLUP_KEY, key)), **{c: amounts.get(c, 0) for c in ROLLUP_TOTALS}}
+                                for key, amounts in totals.items()])
+
+
+def rollup_response(b, role, response, confirmed):
+    """Count a response just applied to ``b`` and stamp the sides it ``confirmed``. The caller commits."""
+    totals = Counter({counter_column(role, response): 1})
+    now = datetime.utcnow()
+    for side in confirmed:
+        setattr(b, f"{side}_confirmed_at", now)
+        totals.update(confirmed_totals(side, b.created_at, now))
+    add_to_rollups({rollup_key(b, getattr(load_principal(b.landowner_id), "address", None)): totals})
+
+
+def rebuild_rollups():
+    """Recompute booking_rollup from every live and archived booking."""
+    addresses = dict(db.session.query(User.id, User.address).filter_by(role="landowner"))
+    totals = defaultdict(Counter)
+    for table in (Booking.__table__, booking_archive):
+        for b in db.session.execute(db.select(table)).yield_per(1000):
+            totals[rollup_key(b, addresses.get(b.landowner_id))].update(booking_totals(b))
+    BookingRollup.query.delete()
+    add_to_rollups(totals)
+    db.session.commit()
+
+
+@app.cli.command("rebuild-rollups")
+def rebuild_rollups_command():
+    """Recompute the admin analytics rollups from the bookings."""
+    setup()
+    rebuild_rollups()
+    click.echo(f"{BookingRollup.query.count()} rollup row(s)")
+
+
+def rollup_rates(row):
+    """A summed rollup row plus its fill and confirmation rates and mean hours to confirm."""
+    def ratio(part, whole, scale=1):
+        return round(part / whole / scale, 3) if whole else None
+
+    return {
+        **row,
+        "labor_fill_rate": ratio(row["labor_accepted"], row["labor_requested"]),
+        "labor_hours_to_confirm": ratio(row["labor_confirm_seconds"], row["labor_confirm_samples"], 3600),
+        "machinery_confirmation_rate": ratio(row["machinery_confirmed"], row["machinery_requested"]),
+        "machinery_hours_to_confirm": ratio(row["machinery_confirm_seconds"], row["machinery_confirm_samples"], 3600),
+    }
+
+
+# ---------------- NOTIFICATIONS ---------------- #
+# booking fan-out runs in `flask work-jobs`, off the request path; see jobs.py and notify.py
+job_queue = jobs.Queue(db, Job, max_attempts=app.config["JOBS_MAX_ATTEMPTS"],
+                       backoff=app.config["JOBS_BACKOFF_SECONDS"])
+
+
+def add_notifications(kind, pairs):
+    """Queue ``kind`` notifications for (user_id, booking_id) pairs and a delivery job per user. The caller commits.
+
+    A pair already notified is skipped, and a user's delivery job absorbs
+    whatever arrives before it runs, so each user gets one message per batch.
+    """
+    now = datetime.utcnow()
+    rows = [{"user_id": uid, "booking_id": booking_id, "kind": kind, "created_at": now} for uid, booking_id in pairs]
+    if not rows:
+        return
+    db.session.execute(sqlite_insert(Notification).on_conflict_do_nothing(), rows)
+    users = sorted({uid for uid, _ in pairs})
+    job_queue.enqueue_many("deliver_notifications", [{"user_id": uid} for uid in users],
+                           [f"deliver_notifications:{uid}" for uid in users], delay=app.config["NOTIFY_BATCH_SECONDS"])
+
+
+def notify_booking_created(payload):
+    """Tell every worker a new booking was routed to."""
+    pairs = db.session.query(BookingEligibility.user_id, BookingEligibility.booking_id).filter(
+        BookingEligibility.booking_id.in_(payload["booking_ids"])).all()
+    add_notifications("booking_created", pairs)
+
+
+def notify_booking_confirmed(payload):
+    """Tell the landowner one side of their booking is confirmed."""
+    b = Booking.query.get(payload["booking_id"])
+    if b:
+        add_notifications(f"{payload['side']}_confirmed", [(b.landowner_id, b.id)])
+
+
+def notification_line(n, b):
+    if b is None:
+        return f"Booking #{n.booking_id} ({n.kind.replace('_', ' ')})"
+    if n.kind == "booking_created":
+        return f"New booking #{b.id} ({b.service_type}): {b.service_date}, {b.days} day(s)"
+    side = n.kind.split("_")[0]
+    return f"Booking #{b.id} on {b.service_date}: {side} {getattr(b, f'{side}_status')}"
+
+
+def deliver_notifications(payload):
+    """Send a user their pending notifications as one message."""
+    user = db.session.query(User.id, User.name, User.contact).filter_by(id=payload["user_id"]).first()
+    pending = (
+        db.session.query(Notification, Booking).outerjoin(Booking, Booking.id == Notification.booking_id)
+        .filter(Notification.user_id == payload["user_id"], Notification.sent_at.is_(None))
+        .order_by(Notification.id).all()
+    )
+    if not pending or user is None:
+        return
+    new = sum(n.kind == "booking_created" for n, _ in pending)
+    if new == len(pending):
+        subject = f"{new} new booking(s) for you"
+    elif not new:
+        subject = f"{len(pending)} booking update(s)"
+    else:
+        subject = f"{new} new booking(s) and {len(pending) - new} update(s)"
+    notifier.send(notify.Message(user.id, user.contact, user.name, subject,
+                                 [notification_line(n, b) for n, b in pending]))
+    Notification.query.filter(Notification.id.in_([n.id for n, _ in pending])).update(
+        {"sent_at": datetime.utcnow()}, synchronize_session=False)
+
+
+JOB_HANDLERS = {
+    "booking_created": notify_booking_created,
+    "booking_confirmed": notify_booking_confirmed,
+    "deliver_notifications": deliver_notifications,
+}
+
+
+@app.cli.command("work-jobs")
+@click.option("--batch", default=100, show_default=True, help="jobs claimed at a time")
+@click.option("--idle", default=1.0, show_default=True, help="seconds to wait when no job is due")
+@click.option("--once", is_flag=True, help="run the jobs due now, then exit")
+def work_jobs_command(batch, idle, once):
+    """Run background jobs: booking notifications and their delivery."""
+    setup()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")  # log:// sends
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    pruned = 0
+    while True:
+        if job_queue.work_once(JOB_HANDLERS, worker, batch):
+            continue
+        if once:
+            break
+        if time.monotonic() - pruned > 3600:
+            job_queue.prune()
+            pruned = time.monotonic()
+        time.sleep(idle)
+    click.echo(", ".join(f"{n} {status}" for status, n in sorted(job_queue.counts().items())) or "no jobs")
+
+
+# ---------------- BOOKING FEEDS ---------------- #
+def feed_args():
+    """Cursor, page size and filter flags from the query string of a booking feed."""
+    args = request.args
+    limit = args.get("limit", app.config["FEED_PAGE_SIZE"], type=int)
+    return {
+        "before": args.get("before", type=int),
+        "limit": max(1, min(limit, app.config["FEED_MAX_PAGE_SIZE"])),
+        "open": args.get("open") == "1",
+        "unresponded": args.get("unresponded") == "1",
+        "when": args.get("when") if args.get("when") in ("upcoming", "in_progress") else None,
+        "free": args.get("free") == "1",
+    }
+
+
+def when_filters(when, today=None):
+    """Date conditions for the ``when`` feed filter: "upcoming" or "in_progress"."""
+    today = today or date.today()
+    if when == "upcoming":
+        return [upcoming(today, app.config["UPCOMING_DAYS"])]
+    if when == "in_progress":
+        return [in_progress(today)]
+    return []
+
+
+def upcoming(today, within_days):
+    """Bookings starting between ``today`` and ``within_days`` days from now."""
+    return Booking.service_date.between(today, today + timedelta(days=within_days))
+
+
+def in_progress(today):
+    """Bookings whose work spans ``today``."""
+    return db.and_(Booking.service_date <= today, Booking.end_date >= today)
+
+
+def booking_feed(user, before=None, limit=50, filters=()):
+    """One page of the bookings routed to ``user``, newest first, keyset-paginated on booking id.
+
+    Walks the (user_id, booking_id) primary key of BookingEligibility backwards,
+    so each page is a bounded index range scan however long the history is.
+    Returns ``(page, next_cursor)``; the cursor is None on the last page.
+    """
+    q = (
+        Booking.query.join(BookingEligibility, BookingEligibility.booking_id == Booking.id)
+        .filter(BookingEligibility.user_id == user.id, *filters)
+        .order_by(BookingEligibility.booking_id.desc())
+    )
+    page = (q.filter(BookingEligibility.booking_id < before) if before else q).limit(limit + 1).all()
+    return page[:limit], (page[limit - 1].id if len(page) > limit else None)
+
+
+def fits_calendar(calendar):
+    """SQL condition: Calendar.fits for every row, so the "free" filter fills pages in SQL.
+
+    One date-range test per busy stretch; the calendar only holds what the
+    worker still has to do, so that stays a handful.
+    """
+    clashes = [db.and_(Booking.service_date <= end, Booking.end_date >= start) for start, end in calendar.stretches()]
+    if not clashes:
+        return db.true()
+    return db.or_(Booking.end_date.is_(None), Booking.id.in_(calendar.accepted), ~db.or_(*clashes))
+
+
+def feed_rows(user, feed):
+    """One page of a labor or machinery user's feed, as their dashboard shows it.
+
+    ``feed`` is from feed_args(). Returns ``(rows, responses, next_cursor)``,
+    ``responses`` being {booking_id: response} for the page.
+    """
+    filters = when_filters(feed["when"])
+    if feed["open"]:
+        filters.append(labor_open_for_more() if user.role == "labor" else machinery_open_for_more())
+    if feed["unresponded"]:
+        filters.append(not_responded_by(user))
+    if feed["free"]:
+        # bookings still to come that clash with nothing the worker has still to do
+        today = date.today()
+        filters += [Booking.end_date >= today, fits_calendar(calendar_for(user, since=today))]
+    # Page through the bookings routed to this worker — and compute whether they can still act
+    bookings, next_cursor = booking_feed(user, feed["before"], feed["limit"], filters)
+    # only accepted bookings reaching into this page's dates can make a row busy
+    starts = [b.service_date for b in bookings if b.service_date]
+    calendar = calendar_for(user, since=min(starts)) if starts else availability.Calendar()
+
+    page_ids = [b.id for b in bookings]
+    responses = {r.booking_id: r.response for r in BookingResponse.query.filter(
+        BookingResponse.user_id == user.id, BookingResponse.booking_id.in_(page_ids))}
+    landowners = user_names(b.landowner_id for b in bookings)
+    if user.role == "machinery":
+        names = accepted_names([b.id for b in bookings if b.machinery_accepted], "machinery")
+
+    rows = []
+    for b in bookings:
+        row = {
+            "id": b.id,
+            "landowner_name": landowners[b.landowner_id],
+            "service_date": b.service_date,
+            "days": b.days,
+        }
+        if user.role == "labor":
+            row.update(service_type=b.service_type, skill=b.skill, num_labor=b.num_labor or 0, **labor_row_status(b))
+        else:
+            row.update(machine_type=b.machine_type, **machinery_row_status(b, names.get(b.id, [])))
+        row["has_responded"] = b.id in responses
+        row["busy_with"] = calendar.busy_with(b)
+        rows.append(row)
+    return rows, responses, next_cursor
+
+
+def not_responded_by(user):
+    return ~db.session.query(BookingResponse.id).filter(
+        BookingResponse.booking_id == Booking.id, BookingResponse.user_id == user.id
+    ).exists()
+
+
+def labor_open_for_more():
+    # mirrors open_for_more in labor_dashboard: no headcount asked, or still short of it
+    return ~db.and_(db.func.coalesce(Booking.num_labor, 0) > 0, Booking.labor_accepted >= Booking.num_labor)
+
+
+def machinery_open_for_more():
+    # mirrors machinery_dashboard: nobody accepted yet and not rejected by every routed owner
+    return db.and_(
+        Booking.machinery_accepted == 0,
+        db.or_(Booking.machinery_pool == 0, Booking.machinery_rejected < Booking.machinery_pool),
+    )
 
 
 # ---------------- ROUTES ---------------- #
@@ -99,8 +1278,15 @@ def register(role):
             skills=form.get("skills") if role == "labor" else None,
             outstation=form.get("outstation") if role == "labor" else None
         )
+        matched = bookings_for_new_user(user)
+        owners = {b.landowner_id for b in matched}  # read before the commit expires them
         db.session.add(user)
+        db.session.flush()
+        route_new_user(user, matched)
         db.session.commit()
+        # a new worker can change booking pools, and with them statuses
+        bump(f"users:{role}")
+        bump_bookings(*owners)
         flash(f"{role.capitalize()} registered successfully!", "success")
         return redirect(url_for("login"))
 
@@ -140,6 +1326,7 @@ def logout():
 # ---------------- LANDOWNER ---------------- #
 # ---------------- LANDOWNER ---------------- #
 @app.route("/landowner", methods=["GET", "POST"])
+@database.read_only
 def landowner_dashboard():
     user = current_user()
     if not user or user.role != "landowner":
@@ -148,90 +1335,35 @@ def landowner_dashboard():
 
     # --- Handle booking creation ---
     if request.method == "POST":
-        form = request.form
-        b = Booking(
-            landowner_id=user.id,
-            service_date=form["service_date"],
-            days=form["days"],
-            service_type=form["service_type"].strip().lower(),
-            num_labor=form.get("num_labor"),
-            machine_type=form.get("machine_type"),
-        )
-        db.session.add(b)
-        db.session.commit()
-        flash("Booking created successfully!", "success")
+        items = [request.form]
+        if request.form.get("repeat_count"):
+            try:
+                items = recurring_items(request.form, request.form.get("repeat_every") or 7,
+                                        request.form["repeat_count"])
+            except ValueError as e:
+                flash(str(e), "danger")
+                return redirect(url_for("landowner_dashboard"))
+        created, results = create_bookings(user, items)
+        if not created:
+            flash(next(iter(next(r for r in results if r["errors"])["errors"].values())), "danger")
+        elif len(results) == 1:
+            flash("Booking created successfully!", "success")
+        else:
+            flash(f"{len(results)} bookings created successfully!", "success")
         return redirect(url_for("landowner_dashboard"))
 
-    # --- Prepare display for existing bookings ---
+    return render_template("landowner_dashboard.html",
+                           landowner=user,
+                           bookings=landowner_bookings(user))
+
+
+def landowner_bookings(user):
+    """Rows of the landowner's bookings table."""
     bookings = Booking.query.filter_by(landowner_id=user.id).all()
-    total_labors = User.query.filter_by(role="labor").count()
-    total_machs = User.query.filter_by(role="machinery").count()
+    statuses = booking_statuses(bookings)
 
     bookings_display = []
     for b in bookings:
-        stype = (b.service_type or "").strip().lower()
-        num_labor = int(b.num_labor) if b.num_labor else 0
-
-        # accepted/rejected labor responses
-        accepted_lab_q = BookingResponse.query.filter_by(
-            booking_id=b.id, user_role="labor", response="Accept"
-        ).all()
-        rejected_lab_count = BookingResponse.query.filter_by(
-            booking_id=b.id, user_role="labor", response="Reject"
-        ).count()
-        accepted_lab_count = len(accepted_lab_q)
-        accepted_lab_names = [User.query.get(r.user_id).name for r in accepted_lab_q]
-
-        # accepted/rejected machinery responses
-        accepted_mach_q = BookingResponse.query.filter_by(
-            booking_id=b.id, user_role="machinery", response="Accept"
-        ).all()
-        rejected_mach_count = BookingResponse.query.filter_by(
-            booking_id=b.id, user_role="machinery", response="Reject"
-        ).count()
-        accepted_mach_names = [User.query.get(r.user_id).name for r in accepted_mach_q]
-
-        # ---- labor status ----
-        if stype == "machinery":
-            labor_status = "N/A"
-        elif stype in ("labor", "both"):
-            if num_labor > 0:
-                if accepted_lab_count >= num_labor:
-                    labor_status = f"Confirmed ({', '.join(accepted_lab_names)})"
-                elif rejected_lab_count >= total_labors and total_labors > 0:
-                    labor_status = "Rejected"
-                else:
-                    labor_status = f"{accepted_lab_count}/{num_labor} Accepted"
-            else:
-                labor_status = "N/A"
-        else:
-            labor_status = "N/A"
-
-        # ---- machinery status ----
-        if stype == "labor":
-            machinery_status = "N/A"
-        elif stype in ("machinery", "both"):
-            if len(accepted_mach_q) > 0:
-                machinery_status = f"Confirmed ({', '.join(accepted_mach_names)})"
-            elif rejected_mach_count >= total_machs and total_machs > 0:
-                machinery_status = "Rejected"
-            else:
-                machinery_status = "Pending"
-        else:
-            machinery_status = "N/A"
-
-        # ---- overall action ----
-        if stype == "both":
-            labor_closed = labor_status.startswith("Confirmed") or labor_status == "Rejected"
-            mach_closed = machinery_status.startswith("Confirmed") or machinery_status == "Rejected"
-            action = "Closed" if (labor_closed and mach_closed) else "Pending"
-        elif stype == "labor":
-            action = "Closed" if labor_status.startswith("Confirmed") or labor_status == "Rejected" else "Pending"
-        elif stype == "machinery":
-            action = "Closed" if machinery_status.startswith("Confirmed") or machinery_status == "Rejected" else "Pending"
-        else:
-            action = "Pending"
-
         bookings_display.append({
             "id": b.id,
             "service_date": b.service_date,
@@ -239,20 +1371,51 @@ def landowner_dashboard():
             "service_type": b.service_type,
             "num_labor": b.num_labor,
             "machine_type": b.machine_type,
-            "labor_status": labor_status,
-            "machinery_status": machinery_status,
-            "action": action
+            **statuses[b.id]
         })
+    return bookings_display
+
 
-    return render_template("landowner_dashboard.html",
-                           landowner=user,
-                           bookings=bookings_display)
 
 
+@app.route("/landowner/bookings", methods=["POST"])
+def bulk_bookings_api():
+    """Create many bookings at once, all or none.
+
+    The JSON body is either ``{"bookings": [item, ...]}`` or
+    ``{"booking": item, "repeat": {"every_days": 7, "count": 10}}``, where an
+    item has the Create Booking form's fields. Answers 201 with the new ids,
+    or 422 with per-item errors and nothing created.
+    """
+    user = current_user()
+    if not user or user.role != "landowner":
+        return jsonify(ok=False, message="Login as landowner first"), 401
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify(ok=False, message="Expected a JSON object"), 400
+    try:
+        if "repeat" in body:
+            repeat = body["repeat"] if isinstance(body["repeat"], dict) else {}
+            if not isinstance(body.get("booking"), dict):
+                raise ValueError("booking must be an object")
+            items = recurring_items(body["booking"], repeat.get("every_days"), repeat.get("count"))
+        else:
+            items = body.get("bookings")
+            if not items or not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+                raise ValueError("bookings must be a non-empty list of objects")
+            if len(items) > app.config["BULK_MAX_BOOKINGS"]:
+                raise ValueError(f"At most {app.config['BULK_MAX_BOOKINGS']} bookings per request")
+    except ValueError as e:
+        return jsonify(ok=False, message=str(e)), 400
+    created, results = create_bookings(user, items)
+    if not created:
+        return jsonify(ok=False, message="Nothing was created; fix the items with errors", results=results), 422
+    return jsonify(ok=True, message=f"{len(results)} booking(s) created", results=results), 201
 
 
 # ---------------- LABOR ---------------- #
 @app.route("/labor", methods=["GET", "POST"])
+@database.read_only
 def labor_dashboard():
     user = current_user()
     if not user or user.role != "labor":
@@ -260,73 +1423,21 @@ def labor_dashboard():
         return redirect(url_for("login"))
 
     if request.method == "POST":
-        booking_id = int(request.form["booking_id"])
-        response = request.form["response"]
-        booking = Booking.query.get(booking_id)
-
-        # prevent double response
-        existing = BookingResponse.query.filter_by(booking_id=booking_id, user_id=user.id).first()
-        if existing:
-            flash("You have already responded to this booking!", "info")
-            return redirect(url_for("labor_dashboard"))
-
-        # save response
-        db.session.add(BookingResponse(booking_id=booking_id, user_id=user.id, response=response, user_role="labor"))
-        db.session.commit()
-        flash(f"You {response.lower()}ed booking {booking_id}", "success")
-        return redirect(url_for("labor_dashboard"))
-
-    # Show ALL bookings that requested labor or both — but compute whether this user can still act
-    bookings_display = []
-    total_labors = User.query.filter_by(role="labor").count()
-
-    for b in Booking.query.filter(Booking.service_type.in_(["labor", "both"])).order_by(Booking.id.desc()).all():
-        # count accepted/rejected for labor
-        accepted_count = BookingResponse.query.filter_by(booking_id=b.id, user_role="labor", response="Accept").count()
-        rejected_count = BookingResponse.query.filter_by(booking_id=b.id, user_role="labor", response="Reject").count()
-        # whether booking still needs labor
-        needed = b.num_labor or 0
-        open_for_more = True
-        if needed > 0 and accepted_count >= needed:
-            open_for_more = False
-
-        # whether current user has already responded
-        user_resp = BookingResponse.query.filter_by(booking_id=b.id, user_id=user.id).first()
-        has_responded = bool(user_resp)
-
-        # compute status display
-        if needed > 0:
-            if accepted_count >= needed:
-                status = "Confirmed"
-            elif rejected_count >= total_labors:
-                status = "Rejected"
-            else:
-                status = f"{accepted_count}/{needed} Accepted"
-        else:
-            # shouldn't normally happen, fallback
-            status = "Pending"
+        status, _, message, _ = respond(user, "labor", int(request.form["booking_id"]), request.form["response"])
+        flash_response(status, message)
+        return redirect(url_for("labor_dashboard", **request.args))
 
-        bookings_display.append({
-            "id": b.id,
-            "landowner_name": User.query.get(b.landowner_id).name,
-            "service_date": b.service_date,
-            "days": b.days,
-            "service_type": b.service_type,
-            "num_labor": needed,
-            "accepted_count": accepted_count,
-            "status": status,
-            "open_for_more": open_for_more,
-            "has_responded": has_responded
-        })
-
-    responses = {r.booking_id: r.response for r in BookingResponse.query.filter_by(user_id=user.id).all()}
-    return render_template("labor_dashboard.html", labor=user, bookings=bookings_display, responses=responses)
+    feed = feed_args()
+    bookings_display, responses, next_cursor = feed_rows(user, feed)
+    return render_template("labor_dashboard.html", labor=user, bookings=bookings_display, responses=responses,
+                           feed=feed, next_cursor=next_cursor)
 
 
 
 
 # ---------------- MACHINERY ---------------- #
 @app.route("/machinery", methods=["GET", "POST"])
+@database.read_only
 def machinery_dashboard():
     user = current_user()
     if not user or user.role != "machinery":
@@ -334,148 +1445,157 @@ def machinery_dashboard():
         return redirect(url_for("login"))
 
     if request.method == "POST":
-        booking_id = int(request.form["booking_id"])
-        response = request.form["response"]
-
-        existing = BookingResponse.query.filter_by(booking_id=booking_id, user_id=user.id).first()
-        if existing:
-            flash("You have already responded!", "info")
-            return redirect(url_for("machinery_dashboard"))
+        status, _, message, _ = respond(user, "machinery", int(request.form["booking_id"]), request.form["response"])
+        flash_response(status, message)
+        return redirect(url_for("machinery_dashboard", **request.args))
 
-        db.session.add(BookingResponse(booking_id=booking_id, user_id=user.id, response=response, user_role="machinery"))
-        db.session.commit()
-        flash(f"You {response.lower()}ed booking {booking_id}", "success")
-        return redirect(url_for("machinery_dashboard"))
+    feed = feed_args()
+    bookings_display, responses, next_cursor = feed_rows(user, feed)
+    return render_template("machinery_dashboard.html", machinery=user, bookings=bookings_display, responses=responses,
+                           feed=feed, next_cursor=next_cursor)
 
-    bookings_display = []
-    total_machs = User.query.filter_by(role="machinery").count()
 
-    for b in Booking.query.filter(Booking.service_type.in_(["machinery", "both"])).order_by(Booking.id.desc()).all():
-        accepted_q = BookingResponse.query.filter_by(booking_id=b.id, user_role="machinery", response="Accept").all()
-        rejected_count = BookingResponse.query.filter_by(booking_id=b.id, user_role="machinery", response="Reject").count()
-        accepted_names = [User.query.get(r.user_id).name for r in accepted_q]
 
-        # requirement: for machinery we consider confirmed if at least one accepts
-        if len(accepted_q) > 0:
-            status = "Confirmed"
-            open_for_more = False
-        elif rejected_count >= total_machs and total_machs>0:
-            status = "Rejected"
-            open_for_more = False
-        else:
-            status = "Pending"
-            open_for_more = True
-
-        user_resp = BookingResponse.query.filter_by(booking_id=b.id, user_id=user.id).first()
-        has_responded = bool(user_resp)
-
-        bookings_display.append({
-            "id": b.id,
-            "landowner_name": User.query.get(b.landowner_id).name,
-            "service_date": b.service_date,
-            "days": b.days,
-            "machine_type": b.machine_type,
-            "accepted_names": accepted_names,
-            "status": status,
-            "open_for_more": open_for_more,
-            "has_responded": has_responded
-        })
-
-    responses = {r.booking_id: r.response for r in BookingResponse.query.filter_by(user_id=user.id).all()}
-    return render_template("machinery_dashboard.html", machinery=user, bookings=bookings_display, responses=responses)
 
+# ---------------- LIVE UPDATES ---------------- #
+@app.route("/bookings/<int:booking_id>/response", methods=["POST"])
+def booking_response_api(booking_id):
+    """Accept/Reject without a page reload: {"ok", "reason", "message", "booking"} for the caller's row.
 
+    ``reason`` is what the row's actions should now say; see respond().
+    """
+    user = current_user()
+    if not user or user.role not in ("labor", "machinery"):
+        return jsonify(ok=False, message="Login as labor or machinery owner first"), 401
+    body = request.get_json(silent=True) if request.is_json else request.form
+    if not isinstance(body, dict):
+        return jsonify(ok=False, reason="invalid", message="Expected a JSON object"), 400
+    response = body.get("response")
+    status, reason, message, event = respond(user, user.role, booking_id, response)
+    return jsonify(ok=status == 200, reason=reason, message=message,
+                   booking={"id": booking_id, **event[user.role]} if event else None), status
+
+
+@app.route("/events")
+@database.read_only
+def booking_event_stream():
+    """Server-Sent Events with status changes for the bookings on the caller's dashboard.
+
+    Landowners get their own bookings, workers the ``?bookings=`` ids they're
+    routed to and admins everything. Each message is the row patch for the
+    caller's role. At most SSE_MAX_STREAMS are open per process; past that
+    the stream ends at once and the browser retries in 30-60 seconds.
+    """
+    user = current_user()
+    if not user:
+        return Response(status=401)
+    if user.role == "labor" or user.role == "machinery":
+        requested = {int(i) for i in request.args.get("bookings", "").split(",") if i.isdigit()}
+        watched = {booking_id for (booking_id,) in db.session.query(BookingEligibility.booking_id).filter(
+            BookingEligibility.user_id == user.id, BookingEligibility.booking_id.in_(requested))}
+        wants = lambda event: event["id"] in watched
+        view = user.role
+    elif user.role == "landowner":
+        wants = lambda event: event["landowner_id"] == user.id
+        view = "landowner"
+    else:
+        wants = lambda event: True
+        view = "landowner"
+    after = booking_events.cursor(request.headers.get("Last-Event-ID"))
+    deadline = time.monotonic() + app.config["SSE_MAX_SECONDS"]
+
+    def stream(after):
+        yield "retry: 3000\n\n"
+        while time.monotonic() < deadline:
+            batch = booking_events.read(after, timeout=15)
+            if not batch:
+                yield ": keepalive\n\n"
+            for event_id, payload in batch:
+                after = event_id
+                if wants(payload):
+                    yield f"id: {event_id}\ndata: {json.dumps({'id': payload['id'], **payload[view]})}\n\n"
+
+    if not event_streams.acquire(blocking=False):
+        # every stream slot is taken: end at once and have the browser try again in a while
+        return Response(f"retry: {random.randint(30000, 60000)}\n\n", mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache"})
+    response = Response(stream(after), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    response.call_on_close(event_streams.release)
+    return response
 
 
 # ---------------- ADMIN ---------------- #
 # ---------------- ADMIN ---------------- #
 @app.route("/admin")
+@database.read_only
 def admin_dashboard():
     user = current_user()
     if not user or user.role != "admin":
         flash("Login as admin first", "danger")
         return redirect(url_for("login"))
 
-    landowners = User.query.filter_by(role="landowner").all()
-    labors = User.query.filter_by(role="labor").all()
-    machineries = User.query.filter_by(role="machinery").all()
-
-    bookings = Booking.query.all()
-    total_labors = User.query.filter_by(role="labor").count()
-    total_machs = User.query.filter_by(role="machinery").count()
+    search = user_search_args()
+    sections = {}
+    for role, key in (("landowner", "landowners"), ("labor", "labors"), ("machinery", "machineries")):
+        if search["role"] in (None, role):
+            sections[key] = admin_user_section(role, f"{key}_table", search)
+    # each unfiltered section is rendered once per version of the data it shows; see cache.py
+    sections["bookings"] = admin_section("bookings_table", ["bookings", "users:landowner"],
+                                         lambda: (admin_bookings(),))
+    return render_template("admin_dashboard.html", sections=sections, search=search)
+
+
+def admin_section(macro, depends_on, load, variant=None):
+    """One admin dashboard section, from the fragment cache when its data hasn't changed.
+
+    ``load`` returns the macro's arguments; ``variant`` tells apart renderings
+    of the same data that differ otherwise.
+    """
+    render = lambda: str(get_template_attribute("admin_sections.html", macro)(*load()))
+    key = f"admin:{macro}:{variant}" if variant else f"admin:{macro}"
+    return Markup(cache.cached(fragments, key, depends_on, render))
+
+
+def admin_user_section(role, macro, search):
+    """One page of ``role``'s users matching the search; the plain first page comes from the cache."""
+    def load():
+        users, total = search_users(search["q"], role, search["page"])
+        return users, admin_pager(role, search, total)
+
+    if not search["q"] and search["page"] == 1:
+        # the pager differs between /admin and /admin?role=, so they're cached apart
+        return admin_section(macro, [f"users:{role}"], load, variant=search["role"] or "all")
+    return Markup(get_template_attribute("admin_sections.html", macro)(*load()))
+
+
+def admin_pager(role, search, total):
+    """Totals and links under a user section: previous/next page, or "all" when it shows every role."""
+    per_page = app.config["ADMIN_PAGE_SIZE"]
+    args = {"q": search["q"] or None, "role": role}
+    page = search["page"]
+    return {
+        "total": total,
+        "first": (page - 1) * per_page + 1,
+        "last": min(page * per_page, total),
+        "prev": url_for("admin_dashboard", page=page - 1, **args) if search["role"] and page > 1 else None,
+        "next": url_for("admin_dashboard", page=page + 1, **args) if search["role"] and page * per_page < total else None,
+        "all": url_for("admin_dashboard", **args) if not search["role"] and total > per_page else None,
+    }
+
+
+def admin_bookings(bookings=None):
+    """Rows of the admin bookings table: every booking, or just ``bookings``."""
+    if bookings is None:
+        bookings = Booking.query.all()
+        booking_owners = users_by_id(db.select(Booking.landowner_id))
+    else:
+        booking_owners = users_by_id([b.landowner_id for b in bookings])
+    statuses = booking_statuses(bookings)
 
     bookings_display = []
     for b in bookings:
-        # normalize service_type (defensive)
-        stype = (b.service_type or "").strip().lower()
-
-        # safe integer for num_labor
-        num_labor = int(b.num_labor) if b.num_labor else 0
-
-        # Get accepted/rejected labors
-        accepted_lab_q = BookingResponse.query.filter_by(
-            booking_id=b.id, user_role="labor", response="Accept"
-        ).all()
-        rejected_lab_count = BookingResponse.query.filter_by(
-            booking_id=b.id, user_role="labor", response="Reject"
-        ).count()
-        accepted_lab_count = len(accepted_lab_q)
-        accepted_lab_names = [User.query.get(r.user_id).name for r in accepted_lab_q]
-
-        # Get accepted/rejected machinery
-        accepted_mach_q = BookingResponse.query.filter_by(
-            booking_id=b.id, user_role="machinery", response="Accept"
-        ).all()
-        rejected_mach_count = BookingResponse.query.filter_by(
-            booking_id=b.id, user_role="machinery", response="Reject"
-        ).count()
-        accepted_mach_names = [User.query.get(r.user_id).name for r in accepted_mach_q]
-
-        # --- Labor status logic ---
-        if stype == "machinery":
-            labor_status = "N/A"
-        elif stype in ("labor", "both"):
-            # show progress: x/num Accepted (if num_labor>0) else show N/A
-            if num_labor > 0:
-                if accepted_lab_count >= num_labor:
-                    labor_status = f"Confirmed ({', '.join(accepted_lab_names)})"
-                elif rejected_lab_count >= total_labors and total_labors > 0:
-                    labor_status = "Rejected"
-                else:
-                    labor_status = f"{accepted_lab_count}/{num_labor} Accepted"
-            else:
-                # no quantity asked
-                labor_status = "N/A"
-        else:
-            labor_status = "N/A"
-
-        # --- Machinery status logic ---
-        if stype == "labor":
-            machinery_status = "N/A"
-        elif stype in ("machinery", "both"):
-            # machinery considered confirmed when at least one accepts
-            if len(accepted_mach_q) > 0:
-                machinery_status = f"Confirmed ({', '.join(accepted_mach_names)})"
-            elif rejected_mach_count >= total_machs and total_machs > 0:
-                machinery_status = "Rejected"
-            else:
-                machinery_status = "Pending"
-        else:
-            machinery_status = "N/A"
-
-        # --- Overall action logic ---
-        if stype == "both":
-            labor_closed = labor_status.startswith("Confirmed") or labor_status == "Rejected"
-            mach_closed = machinery_status.startswith("Confirmed") or machinery_status == "Rejected"
-            action = "Closed" if (labor_closed and mach_closed) else "Pending"
-        elif stype == "labor":
-            action = "Closed" if labor_status.startswith("Confirmed") or labor_status == "Rejected" else "Pending"
-        elif stype == "machinery":
-            action = "Closed" if machinery_status.startswith("Confirmed") or machinery_status == "Rejected" else "Pending"
-        else:
-            action = "Pending"
-
-        landowner = User.query.get(b.landowner_id)
+        landowner = booking_owners.get(b.landowner_id)
         bookings_display.append({
             "id": b.id,
             "landowner_name": landowner.name if landowner else "Unknown",
@@ -484,18 +1604,258 @@ def admin_dashboard():
             "service_type": b.service_type,
             "service_date": b.service_date,
             "days": b.days,
-            "labor_status": labor_status,
-            "machinery_status": machinery_status,
-            "action": action
+            **statuses[b.id]
         })
+    return bookings_display
 
-    return render_template(
-        "admin_dashboard.html",
-        landowners=landowners,
-        labors=labors,
-        machineries=machineries,
-        bookings=bookings_display
-    )
+
+@app.route("/admin/analytics")
+@database.read_only
+def admin_analytics():
+    """Demand and fill rates from booking_rollup, so the cost doesn't grow with the bookings.
+
+    ``?district=``, ``?month=``, ``?service_type=`` and ``?machine_type=``
+    filter; ``?by=`` lists the key columns to group on (comma separated,
+    default all four, empty for one grand total).
+    """
+    user = current_user()
+    if not user or user.role != "admin":
+        return jsonify(error="Login as admin first"), 401
+    by = [k for k in request.args.get("by", ",".join(ROLLUP_KEY)).split(",") if k in ROLLUP_KEY]
+    keys = [getattr(BookingRollup, k) for k in by]
+    q = db.session.query(*keys, *[db.func.coalesce(db.func.sum(getattr(BookingRollup, c)), 0).label(c)
+                                  for c in ROLLUP_TOTALS])
+    q = q.filter(*[getattr(BookingRollup, k) == request.args[k] for k in ROLLUP_KEY if k in request.args])
+    if keys:
+        q = q.group_by(*keys).order_by(*keys)
+    return jsonify(by=by, rows=[rollup_rates(row._asdict()) for row in q])
+
+
+# ---------------- JSON API ---------------- #
+# bump when the shape of a response changes, so clients holding old ETags refetch
+API_VERSION = "v1"
+
+
+def conditional_json(scope, depends_on, build):
+    """``jsonify(build())`` under a strong ETag, or 304 without calling ``build`` if the client has it.
+
+    The ETag hashes ``scope`` (whose data, which page of it) with the current
+    versions of the counters in ``depends_on`` and the cache backend's epoch,
+    so answering 304 costs one counter lookup. Counters are read before the
+    data and bumped after commits, so a body is never older than its ETag.
+    """
+    state = f"{API_VERSION}|{scope}|{fragments.epoch()}|{cache.version_key(fragments, depends_on)}"
+    etag = hashlib.sha1(state.encode()).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    # per-user data: browsers may keep it but must ask again every time
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def api_rows(rows):
+    """Dashboard rows with dates as ISO strings."""
+    return [{k: v.isoformat() if isinstance(v, date) else v for k, v in row.items()} for row in rows]
+
+
+@app.route(f"/api/{API_VERSION}/landowner/bookings")
+@database.read_only
+def landowner_bookings_api():
+    """The logged-in landowner's bookings with their statuses."""
+    user = current_user()
+    if not user or user.role != "landowner":
+        return jsonify(error="Login as landowner first"), 401
+    # the landowner's own counter, not "bookings", so other landowners' activity doesn't change the ETag
+    return conditional_json(f"landowner:{user.id}", [f"landowner:{user.id}", "bookings:rebuilt"],
+                            lambda: {"bookings": api_rows(landowner_bookings(user))})
+
+
+@app.route(f"/api/{API_VERSION}/feed")
+@database.read_only
+def feed_api():
+    """One page of the logged-in worker's feed; takes the dashboard's query parameters.
+
+    ``next_cursor`` goes in ``?before=`` for the following page.
+    """
+    user = current_user()
+    if not user or user.role not in ("labor", "machinery"):
+        return jsonify(error="Login as labor or machinery owner first"), 401
+    feed = feed_args()
+
+    def build():
+        rows, _, next_cursor = feed_rows(user, feed)
+        return {"bookings": api_rows(rows), "next_cursor": next_cursor}
+
+    # a worker's page can change with any booking, and "when" filters with the date
+    scope = f"feed:{user.id}:{date.today()}:" + ",".join(f"{k}={v}" for k, v in sorted(feed.items()))
+    return conditional_json(scope, ["bookings"], build)
+
+
+@app.route(f"/api/{API_VERSION}/admin/bookings")
+@database.read_only
+def admin_bookings_api():
+    """Every booking, newest first, a page at a time: ``?before=`` (from ``next_cursor``) and ``?limit=``."""
+    user = current_user()
+    if not user or user.role != "admin":
+        return jsonify(error="Login as admin first"), 401
+    before = request.args.get("before", type=int)
+    limit = max(1, min(request.args.get("limit", app.config["FEED_PAGE_SIZE"], type=int),
+                       app.config["FEED_MAX_PAGE_SIZE"]))
+
+    def build():
+        q = Booking.query.order_by(Booking.id.desc())
+        bookings = (q.filter(Booking.id < before) if before else q).limit(limit + 1).all()
+        return {"bookings": api_rows(admin_bookings(bookings[:limit])),
+                "next_cursor": bookings[limit - 1].id if len(bookings) > limit else None}
+
+    return conditional_json(f"admin:{before}:{limit}", ["bookings", "users:landowner"], build)
+
+
+# ---------------- USER SEARCH ---------------- #
+# the FTS5 index over user built by migration 005; not in db.metadata, so create_all() leaves it alone
+user_search = db.table("user_search", db.column("rowid"), db.column("rank"))
+USER_ROLES = ("landowner", "labor", "machinery")
+
+
+def user_search_args():
+    """Search text, role and page from the query string of the admin views."""
+    args = request.args
+    role = args.get("role")
+    return {
+        "q": args.get("q", "").strip(),
+        "role": role if role in USER_ROLES else None,
+        "page": max(1, args.get("page", 1, type=int)),
+    }
+
+
+def fts_match(text):
+    """FTS5 MATCH string for free text: every word must start a token ("ravi 98" -> "ravi"* "98"*)."""
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", text.lower()))
+
+
+@functools.lru_cache(maxsize=None)
+def has_user_search():
+    # migration 005 skips the index when SQLite is built without FTS5
+    return db.inspect(db.engine).has_table("user_search")
+
+
+def search_users(text=None, role=None, page=1):
+    """``(users, total)`` for one page of users matching ``text`` (best match first) and ``role``.
+
+    Without ``text`` it's a plain role listing, newest first. Matching uses the
+    user_search FTS5 index; without one every word is LIKE-matched instead.
+    """
+    per_page = app.config["ADMIN_PAGE_SIZE"]
+    q = User.query
+    if role:
+        q = q.filter(User.role == role)
+    match = fts_match(text or "")
+    if match and has_user_search():
+        hits = (db.select(user_search.c.rowid, user_search.c.rank)
+                .where(db.text("user_search MATCH :match").bindparams(match=match)).subquery())
+        q = q.join(hits, hits.c.rowid == User.id).order_by(hits.c.rank, User.id)
+    elif match:
+        fields = (User.name, User.address, User.contact, User.skills, User.crops, User.machine_type)
+        for word in re.findall(r"\w+", text.lower()):
+            q = q.filter(db.or_(*(f.ilike(f"%{word}%") for f in fields)))
+        q = q.order_by(User.id.desc())
+    else:
+        q = q.order_by(User.id.desc())
+    total = q.order_by(None).count()
+    return q.offset((page - 1) * per_page).limit(per_page).all(), total
+
+
+@app.route("/admin/users/search")
+@database.read_only
+def admin_user_search():
+    """JSON page of users matching ``?q=`` (and optionally ``?role=``), ``?page=`` from 1."""
+    user = current_user()
+    if not user or user.role != "admin":
+        return jsonify(error="Login as admin first"), 401
+    search = user_search_args()
+    users, total = search_users(search["q"], search["role"], search["page"])
+    fields = ("id", "role", "name", "username", "contact", "address", "skills", "crops", "machine_type")
+    more = search["page"] * app.config["ADMIN_PAGE_SIZE"] < total
+    return jsonify(users=[{f: getattr(u, f) for f in fields} for u in users], total=total,
+                   page=search["page"], next_page=search["page"] + 1 if more else None)
+
+
+# ---------------- ADMIN EXPORT ---------------- #
+EXPORT_BATCH = 1000
+
+
+def export_rows(entity):
+    """(column names, SELECT) for an export; rows come back as plain tuples, not ORM objects."""
+    if entity == "users":
+        columns = [c for c in User.__table__.columns if c.name != "password"]
+        query = db.select(*columns).order_by(User.id)
+        if request.args.get("role"):
+            query = query.where(User.role == request.args["role"])
+        return [c.name for c in columns], query
+    if entity == "bookings":
+        landowner = db.aliased(User)
+        query = (db.select(*Booking.__table__.columns, landowner.name.label("landowner_name"))
+                 .outerjoin(landowner, landowner.id == Booking.landowner_id).order_by(Booking.id))
+        return [c.name for c in Booking.__table__.columns] + ["landowner_name"], query
+    if entity == "responses":
+        query = (db.select(*BookingResponse.__table__.columns, User.name.label("user_name"))
+                 .outerjoin(User, User.id == BookingResponse.user_id).order_by(BookingResponse.id))
+        return [c.name for c in BookingResponse.__table__.columns] + ["user_name"], query
+    return None, None
+
+
+def export_records(entity, query):
+    """Dicts for every row, with booking statuses recomputed from the counters, streamed in batches."""
+    result = db.session.execute(query.execution_options(yield_per=EXPORT_BATCH))
+    for row in result:
+        record = row._asdict()
+        if entity == "bookings":
+            # same text the dashboards show; replaces the stored columns of the same names
+            record.update(booking_status(row))
+        yield record
+
+
+class _Echo:
+    # csv.writer target that hands each formatted line straight back
+    def write(self, line):
+        return line
+
+
+@app.route("/admin/export/<entity>")
+@database.read_only
+def admin_export(entity):
+    """Stream every user, booking or response as CSV (default) or NDJSON (?format=ndjson)."""
+    user = current_user()
+    if not user or user.role != "admin":
+        flash("Login as admin first", "danger")
+        return redirect(url_for("login"))
+    columns, query = export_rows(entity)
+    if query is None:
+        return Response(f"unknown export {entity!r}\n", status=404, mimetype="text/plain")
+    ndjson = request.args.get("format") == "ndjson"
+
+    def generate():
+        lines = []
+        if not ndjson:
+            writer = csv.writer(_Echo())
+            yield writer.writerow(columns)  # first byte before the query runs
+        for n, record in enumerate(export_records(entity, query)):
+            lines.append(json.dumps(record, default=str) + "\n" if ndjson
+                         else writer.writerow([record[c] for c in columns]))
+            # the first row goes out on its own so the download starts at once, then whole batches
+            if n == 0 or len(lines) >= EXPORT_BATCH:
+                yield "".join(lines)
+                lines = []
+        yield "".join(lines)
+
+    filename = f"{entity}-{date.today().isoformat()}.{'ndjson' if ndjson else 'csv'}"
+    return Response(stream_with_context(generate()),
+                    mimetype="application/x-ndjson" if ndjson else "text/csv",
+                    headers={"Content-Disposition": f"attachment; filename={filename}"})
 
 
 if __name__ == "__main__":
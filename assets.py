@@ -0,0 +1,202 @@
+"""Static asset pipeline: fingerprinted names, precompressed text and responsive images.
+
+``build()`` (``flask build-assets``) writes everything under ``static/`` into
+``static/dist/``:
+
+* each file as ``name.<hash>.ext``, the hash being the start of the sha256
+  of its contents, so a changed file gets a new URL
+* ``.gz`` and, with the ``brotli`` package, ``.br`` copies of text files
+* for JPEG and PNG images, with Pillow: a copy at each of ``WIDTHS`` below
+  the image's own width, and at its own width, in its format and as WebP
+
+``manifest.json`` maps each source name to its outputs. Files whose contents
+haven't changed since the last build are skipped, so a build on every start
+(see Procfile) only costs the first time.
+
+``init_app(app)`` serves ``static/dist`` at ``/assets/`` with one-year
+``immutable`` cache headers, picking the .br or .gz copy the browser
+accepts, and adds template globals:
+
+* ``asset_url(filename)`` -- like ``url_for("static", filename=...)``, but
+  fingerprinted when built
+* ``srcset(filename, type)`` -- "url 320w, url 640w, ..." for an image
+* ``picture(filename, alt, sizes, **attrs)`` -- a ``<picture>`` with WebP
+  and fallback srcsets
+
+Without a build they fall back to plain ``/static`` URLs, so development
+needs no build step.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+
+from flask import request, send_from_directory, url_for
+from markupsafe import Markup, escape
+
+DIST = "dist"
+TEXT_TYPES = {".css", ".js", ".svg", ".json", ".txt"}
+IMAGE_FORMATS = {".jpg": "JPEG", ".jpeg": "JPEG", ".png": "PNG"}
+WIDTHS = (80, 160, 320, 640, 960, 1280, 1920)
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+MAX_AGE = 365 * 24 * 3600
+
+mimetypes.add_type("image/webp", ".webp")  # unknown to older Pythons
+
+
+# ---------------- BUILD ---------------- #
+def fingerprint(name, digest, suffix=""):
+    stem, ext = os.path.splitext(name)
+    return f"{stem}{suffix}.{digest}{ext}"
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "wb") as f:
+        f.write(data)
+    os.replace(path + ".tmp", path)
+
+
+def outputs(entry):
+    """Every file a manifest entry refers to, relative to dist."""
+    files = [entry["file"]] + [entry["file"] + suffix for name, suffix in ENCODINGS if name in entry.get("encodings", ())]
+    return files + [v["file"] for v in entry.get("variants", ())]
+
+
+def precompress(path, data):
+    """Write .gz (and .br, when brotli is installed) next to ``path``; returns the encodings written."""
+    written = ["gzip"]
+    write(path + ".gz", gzip.compress(data, 9, mtime=0))
+    try:
+        import brotli
+    except ImportError:
+        return written
+    write(path + ".br", brotli.compress(data, quality=11))
+    return ["br"] + written
+
+
+def image_variants(source, name, digest, dist, widths):
+    """Resized copies of an image in its own format and WebP; {} without Pillow."""
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return {}
+    ext = os.path.splitext(name)[1].lower()
+    with Image.open(source) as original:
+        image = ImageOps.exif_transpose(original)
+        width, height = image.size
+        if IMAGE_FORMATS[ext] == "JPEG":
+            image = image.convert("RGB")
+        variants = []
+        for w in sorted({w for w in widths if w < width} | {width}):
+            resized = image if w == width else image.resize((w, max(1, round(height * w / width))), Image.LANCZOS)
+            for fmt, out_ext, options in ((IMAGE_FORMATS[ext], ext, {"optimize": True}),
+                                          ("WEBP", ".webp", {"quality": 78, "method": 6})):
+                if fmt == "JPEG":
+                    options = dict(options, quality=80, progressive=True)
+                file = fingerprint(os.path.splitext(name)[0] + out_ext, digest, f"-{w}w")
+                os.makedirs(os.path.dirname(os.path.join(dist, file)), exist_ok=True)
+                resized.save(os.path.join(dist, file), fmt, **options)
+                variants.append({"width": w, "type": mimetypes.types_map[out_ext], "file": file})
+    return {"width": width, "height": height, "variants": variants}
+
+
+def build(static_dir, widths=WIDTHS, log=print):
+    """Build ``static_dir/dist`` and its manifest; returns the manifest."""
+    dist = os.path.join(static_dir, DIST)
+    manifest_path = os.path.join(dist, "manifest.json")
+    try:
+        with open(manifest_path) as f:
+            previous = json.load(f)
+    except (OSError, ValueError):
+        previous = {}
+    manifest = {}
+    for root, dirs, files in os.walk(static_dir):
+        if os.path.abspath(root) == os.path.abspath(static_dir):
+            dirs[:] = [d for d in dirs if d != DIST]
+        for filename in sorted(files):
+            source = os.path.join(root, filename)
+            name = os.path.relpath(source, static_dir).replace(os.sep, "/")
+            with open(source, "rb") as f:
+                data = f.read()
+            digest = hashlib.sha256(data).hexdigest()[:12]
+            old = previous.get(name)
+            if old and old["hash"] == digest and all(os.path.exists(os.path.join(dist, o)) for o in outputs(old)):
+                manifest[name] = old
+                continue
+            entry = {"hash": digest, "file": fingerprint(name, digest), "size": len(data)}
+            write(os.path.join(dist, entry["file"]), data)
+            ext = os.path.splitext(name)[1].lower()
+            if ext in TEXT_TYPES:
+                entry["encodings"] = precompress(os.path.join(dist, entry["file"]), data)
+            elif ext in IMAGE_FORMATS:
+                entry.update(image_variants(source, name, digest, dist, widths))
+            manifest[name] = entry
+            log(f"built {name} -> {entry['file']} ({len(outputs(entry))} file(s))")
+    write(manifest_path, json.dumps(manifest, indent=1, sort_keys=True).encode())
+    return manifest
+
+
+# ---------------- SERVING ---------------- #
+class Assets:
+    def __init__(self, static_dir):
+        self.dist = os.path.join(static_dir, DIST)
+        try:
+            with open(os.path.join(self.dist, "manifest.json")) as f:
+                self.manifest = json.load(f)
+        except (OSError, ValueError):
+            self.manifest = {}
+        self.encodings = {e["file"]: e.get("encodings", ()) for e in self.manifest.values()}
+
+    def url(self, filename):
+        entry = self.manifest.get(filename)
+        if entry is None:
+            return url_for("static", filename=filename)
+        return url_for("asset", filename=entry["file"])
+
+    def variants(self, filename, type=None):
+        entry = self.manifest.get(filename) or {}
+        return [v for v in entry.get("variants", ()) if type is None or v["type"] == type]
+
+    def srcset(self, filename, type=None):
+        return ", ".join(f"{url_for('asset', filename=v['file'])} {v['width']}w" for v in self.variants(filename, type))
+
+    def picture(self, filename, alt="", sizes="100vw", **attrs):
+        attributes = "".join(f' {name}="{escape(value)}"' for name, value in attrs.items())
+        fallback = [v for v in self.variants(filename) if v["type"] != "image/webp"]
+        if not fallback:
+            return Markup(f'<img src="{escape(self.url(filename))}" alt="{escape(alt)}"{attributes}>')
+        src = url_for("asset", filename=fallback[-1]["file"])
+        return Markup(
+            f'<picture><source type="image/webp" srcset="{self.srcset(filename, "image/webp")}" sizes="{escape(sizes)}">'
+            f'<img src="{src}" srcset="{self.srcset(filename, fallback[0]["type"])}" sizes="{escape(sizes)}" '
+            f'alt="{escape(alt)}"{attributes}></picture>'
+        )
+
+    def send(self, filename):
+        """A built file, precompressed if the browser accepts it, cached for a year."""
+        mimetype = mimetypes.guess_type(filename)[0]
+        encodings = self.encodings.get(filename, ())
+        response = None
+        for encoding, suffix in ENCODINGS:
+            if encoding in encodings and request.accept_encodings[encoding]:
+                response = send_from_directory(self.dist, filename + suffix, mimetype=mimetype, max_age=MAX_AGE)
+                response.headers["Content-Encoding"] = encoding
+                break
+        if response is None:
+            response = send_from_directory(self.dist, filename, mimetype=mimetype, max_age=MAX_AGE)
+        if encodings:
+            response.vary.add("Accept-Encoding")
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+
+def init_app(app):
+    assets = Assets(app.static_folder)
+    app.add_url_rule("/assets/<path:filename>", "asset", assets.send)
+    app.add_template_global(assets.url, "asset_url")
+    app.add_template_global(assets.srcset, "srcset")
+    app.add_template_global(assets.picture, "picture")
+    return assets
@@ -0,0 +1,59 @@
+"""Worker availability calendars.
+
+A worker is busy on every day of every booking they've accepted. A
+``Calendar`` keeps those days as intervals sorted by start, with overlaps
+merged (older data may have them), so the intervals are disjoint and their
+ends are sorted too. The only interval that can overlap a queried range is
+then the last one starting on or before the range's end: one binary search.
+
+Ranges are whole days, inclusive at both ends, like a booking's
+``service_date`` .. ``end_date``.
+"""
+from bisect import bisect_right
+
+
+class Calendar:
+    def __init__(self, intervals=()):
+        """``intervals``: (start, end, booking_id) for each accepted booking; rows without dates are skipped."""
+        self.starts, self.ends, self.booking_ids = [], [], []
+        self.accepted = set()  # every booking's id, including those merged into another's stretch
+        for start, end, booking_id in sorted(i for i in intervals if i[0] is not None and i[1] is not None):
+            self.accepted.add(booking_id)
+            if self.ends and start <= self.ends[-1]:
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+                self.booking_ids.append(booking_id)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def stretches(self):
+        """(start, end) of each busy stretch, in order."""
+        return list(zip(self.starts, self.ends))
+
+    def conflict(self, start, end):
+        """A booking id from the busy stretch overlapping ``start``..``end``, or None if the worker is free."""
+        if start is None or end is None:
+            return None
+        i = bisect_right(self.starts, end)
+        if i and self.ends[i - 1] >= start:
+            return self.booking_ids[i - 1]
+        return None
+
+    def is_free(self, start, end):
+        return self.conflict(start, end) is None
+
+    def busy_with(self, booking):
+        """The booking id keeping the worker from ``booking`` (anything with id, service_date and end_date), or None.
+
+        A booking the worker has accepted is their own work, not a clash with it.
+        """
+        if booking.id in self.accepted:
+            return None
+        return self.conflict(booking.service_date, booking.end_date)
+
+    def fits(self, booking):
+        """Whether ``booking`` fits the worker's free days, or is one they've accepted."""
+        return self.busy_with(booking) is None
@@ -0,0 +1,234 @@
+"""Benchmark every route against seeded databases of increasing size.
+
+    python bench.py --sizes 1000,10000,100000 --out bench-results.json
+    python bench.py --compare before.json after.json
+
+For each size a database is seeded once with seed.py and cached in
+--data-dir; every run works on a fresh copy so POSTs don't accumulate.
+Each size runs in its own process (the app binds its database at import)
+and drives the routes through Flask's test client, recording latency and
+the number of SQL statements per request. Results are printed as a table
+and saved as JSON so two versions can be compared with --compare.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+# part of the cached seed's file name; bump when seed.py changes what it writes
+SEED_VERSION = 2
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    k = (len(ordered) - 1) * p / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+# ---------------- ONE SIZE (child process) ---------------- #
+def run_size(requests_per_route, random_seed=0):
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    from app import Booking, BookingEligibility, BookingResponse, User, app, db
+
+    rnd = random.Random(random_seed)
+    queries = [0]
+    event.listen(Engine, "before_cursor_execute", lambda *a, **kw: queries.__setitem__(0, queries[0] + 1))
+
+    client = app.test_client()
+    client.get("/")  # runs setup() outside the measurements
+
+    with app.app_context():
+        ids = {role: [uid for (uid,) in db.session.query(User.id).filter_by(role=role)]
+               for role in ("admin", "landowner", "labor", "machinery")}
+        usernames = [name for (name,) in db.session.query(User.username).limit(2000)]
+        # (user, booking) pairs a worker can still respond to, for the response POSTs
+        open_pairs = {}
+        for role in ("labor", "machinery"):
+            responded = db.session.query(BookingResponse.id).filter(
+                BookingResponse.booking_id == BookingEligibility.booking_id,
+                BookingResponse.user_id == BookingEligibility.user_id).exists()
+            open_pairs[role] = (
+                db.session.query(BookingEligibility.user_id, BookingEligibility.booking_id)
+                .join(User, User.id == BookingEligibility.user_id)
+                .filter(User.role == role, ~responded)
+                .order_by(db.func.random()).limit(requests_per_route).all()
+            )
+        counts = {"bookings": Booking.query.count(), "users": User.query.count(),
+                  "responses": BookingResponse.query.count()}
+
+    def login_as(uid):
+        with client.session_transaction() as s:
+            s["user_id"] = uid
+
+    def dashboard(role, path):
+        def go(i):
+            login_as(rnd.choice(ids[role]))
+            return client.get(path)
+        return go
+
+    def register(i):
+        return client.post("/register/labor", data={
+            "username": f"bench-{time.time_ns()}-{i}", "password": "pass", "name": "Bench Labor",
+            "address": "Coimbatore", "contact": "9000000000", "skills": "Harvesting", "outstation": "no"})
+
+    def login(i):
+        return client.post("/login", data={"username": rnd.choice(usernames), "password": "pass"})
+
+    def create_booking(i):
+        login_as(rnd.choice(ids["landowner"]))
+        return client.post("/landowner", data={
+            "service_date": "2026-06-01", "days": "2", "service_type": rnd.choice(["labor", "machinery", "both"]),
+            "num_labor": "3", "machine_type": "Tractor", "skill": "Harvesting"})
+
+    def respond(role, path):
+        def go(i):
+            pairs = open_pairs[role]
+            if i >= len(pairs):
+                return None
+            user_id, booking_id = pairs[i]
+            login_as(user_id)
+            return client.post(path, data={"booking_id": booking_id, "response": rnd.choice(["Accept", "Reject"])})
+        return go
+
+    routes = {
+        "home": lambda i: client.get("/"),
+        "login": login,
+        "register": register,
+        "landowner_dashboard": dashboard("landowner", "/landowner"),
+        "labor_dashboard": dashboard("labor", "/labor"),
+        "machinery_dashboard": dashboard("machinery", "/machinery"),
+        "admin_dashboard": dashboard("admin", "/admin"),
+        "create_booking": create_booking,
+        "labor_response": respond("labor", "/labor"),
+        "machinery_response": respond("machinery", "/machinery"),
+    }
+
+    results = {}
+    for name, go in routes.items():
+        latencies, query_counts = [], []
+        for i in range(requests_per_route):
+            queries[0] = 0
+            start = time.perf_counter()
+            response = go(i)
+            elapsed = time.perf_counter() - start
+            if response is None:
+                break
+            if response.status_code >= 400:
+                raise SystemExit(f"{name}: HTTP {response.status_code}")
+            latencies.append(elapsed * 1000)
+            query_counts.append(queries[0])
+        results[name] = {
+            "n": len(latencies),
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p95_ms": round(percentile(latencies, 95), 3),
+            "mean_queries": round(sum(query_counts) / len(query_counts), 2) if query_counts else 0,
+            "max_queries": max(query_counts, default=0),
+        }
+    return {"rows": counts, "routes": results}
+
+
+# ---------------- DRIVER ---------------- #
+def prepare_db(size, data_dir, random_seed):
+    """Path of a fresh working copy of the seeded database for ``size`` bookings."""
+    os.makedirs(data_dir, exist_ok=True)
+    seeded = os.path.join(data_dir, f"seed-{size}-{random_seed}-v{SEED_VERSION}.db")
+    if not os.path.exists(seeded):
+        print(f"seeding {size} bookings into {seeded} ...", file=sys.stderr)
+        partial = seeded + ".partial"
+        if os.path.exists(partial):
+            os.remove(partial)
+        subprocess.run([sys.executable, os.path.join(BASE_DIR, "seed.py"), "--db", partial,
+                        "--bookings", str(size), "--seed", str(random_seed)], check=True, stdout=sys.stderr)
+        os.replace(partial, seeded)
+    work = os.path.join(data_dir, f"work-{size}.db")
+    shutil.copyfile(seeded, work)
+    return work
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(results):
+    for size, data in results.items():
+        print(f"\n{size} bookings ({data['rows']['responses']} responses, {data['rows']['users']} users)")
+        print(f"  {'route':<22}{'p50 ms':>10}{'p95 ms':>10}{'queries':>10}")
+        for name, r in data["routes"].items():
+            print(f"  {name:<22}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['mean_queries']:>10.1f}")
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{old['meta'].get('revision')} -> {new['meta'].get('revision')}")
+    for size, data in new["results"].items():
+        if size not in old["results"]:
+            continue
+        print(f"\n{size} bookings")
+        print(f"  {'route':<22}{'p50 ms':>22}{'p95 ms':>22}{'queries':>16}")
+        for name, r in data["routes"].items():
+            o = old["results"][size]["routes"].get(name)
+            if not o:
+                continue
+            change = (r["p50_ms"] - o["p50_ms"]) / o["p50_ms"] * 100 if o["p50_ms"] else 0.0
+            print(f"  {name:<22}{o['p50_ms']:>9.2f} -> {r['p50_ms']:<8.2f}{change:>+4.0f}%"
+                  f"{o['p95_ms']:>9.2f} -> {r['p95_ms']:<10.2f}"
+                  f"{o['mean_queries']:>6.1f} -> {r['mean_queries']:<6.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma separated booking counts")
+    parser.add_argument("--requests", type=int, default=50, help="requests per route")
+    parser.add_argument("--data-dir", default=os.path.join("/tmp", "krishikaya-bench"))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write results as JSON to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    if args.child:
+        json.dump(run_size(args.requests, args.seed), sys.stdout)
+        return
+
+    results = {}
+    for size in [int(s) for s in args.sizes.split(",")]:
+        env = dict(os.environ, DATABASE_URL="sqlite:///" + prepare_db(size, args.data_dir, args.seed))
+        print(f"benchmarking {size} bookings ...", file=sys.stderr)
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", "--requests", str(args.requests),
+                              "--seed", str(args.seed)], env=env, check=True, stdout=subprocess.PIPE, text=True).stdout
+        results[str(size)] = json.loads(out)
+
+    print_table(results)
+    if args.out:
+        meta = {"revision": git_revision(), "python": platform.python_version(),
+                "requests_per_route": args.requests, "seed": args.seed,
+                "created": datetime.now(timezone.utc).isoformat(timespec="seconds")}
+        with open(args.out, "w") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+        print(f"\nsaved {args.out}")
+
+
+if __name__ == "__main__":
+    main()
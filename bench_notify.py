@@ -0,0 +1,123 @@
+"""Fan-out throughput of the booking notification jobs.
+
+    python bench_notify.py --recipients 5000 --bookings 20 --workers 2
+
+A fresh database gets one landowner and --recipients laborers who all match
+the same kind of booking. The landowner then creates --bookings of them in
+one bulk request, so every laborer has --bookings notifications coming. Then
+--workers processes run ``work-jobs`` against the stub sender until the
+queue is empty.
+
+Reported:
+
+* how long the bulk create took, enqueueing included (the request path)
+* fan-out time, messages sent and notifications per message, which shows the
+  per-recipient batching
+* messages per second, and how many jobs were retried (--fail) or are dead
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+
+
+# ---------------- ONE WORKER (child process) ---------------- #
+def run_worker(batch):
+    from app import JOB_HANDLERS, Job, app, job_queue, notifier
+
+    worker = f"bench:{os.getpid()}"
+    with app.app_context():
+        while True:
+            if job_queue.work_once(JOB_HANDLERS, worker, batch):
+                continue
+            if not Job.query.filter(Job.status.in_(["queued", "running"])).count():
+                break
+            time.sleep(0.01)  # retries waiting out their backoff, or jobs leased by another worker
+    return {"sent": len(notifier.sent), "notifications": sum(len(m.lines) for m in notifier.sent)}
+
+
+# ---------------- DRIVER ---------------- #
+def prepare(recipients):
+    """Create the landowner and the laborers; returns the landowner's id."""
+    from app import User, app, db, setup
+
+    with app.app_context():
+        setup()
+        owner = User(role="landowner", name="Bench Owner", username="bench-owner", password="pass",
+                     address="Pollachi")
+        db.session.add(owner)
+        db.session.execute(db.insert(User), [
+            {"role": "labor", "name": f"Labor {i}", "username": f"bench-labor{i}", "password": "pass",
+             "contact": f"9{i:09d}", "address": "Pollachi", "skills": "Harvesting", "outstation": "no"}
+            for i in range(recipients)
+        ])
+        db.session.commit()
+        return owner.id
+
+
+def create(owner_id, bookings):
+    """Bulk-create the bookings; returns seconds taken."""
+    from app import User, app, create_bookings
+
+    with app.app_context():
+        owner = User.query.get(owner_id)
+        started = time.perf_counter()
+        created, _ = create_bookings(owner, [
+            {"service_date": "2026-06-01", "days": 1, "service_type": "labor", "num_labor": 5, "skill": "Harvesting"}
+        ] * bookings)
+        assert created
+        return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--recipients", type=int, default=5000)
+    parser.add_argument("--bookings", type=int, default=20, help="bookings created in the one bulk request")
+    parser.add_argument("--workers", type=int, default=1, help="work-jobs processes")
+    parser.add_argument("--batch", type=int, default=100, help="jobs each worker claims at a time")
+    parser.add_argument("--fail", type=float, default=0.0, help="share of stub sends that fail and are retried")
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds the stub sender takes per message")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        json.dump(run_worker(args.batch), sys.stdout)
+        return
+
+    path = os.path.join(tempfile.mkdtemp(prefix="krishikaya-notify-"), "notify.db")
+    env = {"DATABASE_URL": "sqlite:///" + path, "NOTIFY_URL": f"stub://?fail={args.fail}&delay={args.delay}",
+           "NOTIFY_BATCH_SECONDS": "0", "JOBS_BACKOFF_SECONDS": "0.05"}
+    os.environ.update(env)
+    owner_id = prepare(args.recipients)
+    create_s = create(owner_id, args.bookings)
+    print(f"bulk create of {args.bookings} bookings for {args.recipients} recipients: {create_s * 1000:.1f}ms")
+
+    started = time.perf_counter()
+    children = [subprocess.Popen([sys.executable, os.path.abspath(__file__), "--child", "--batch", str(args.batch)],
+                                 env=dict(os.environ, **env), stdout=subprocess.PIPE, text=True)
+                for _ in range(args.workers)]
+    results = [json.loads(child.communicate()[0]) for child in children]
+    elapsed = time.perf_counter() - started
+
+    from app import Job, Notification, app, db
+    with app.app_context():
+        statuses = dict(db.session.query(Job.status, db.func.count()).group_by(Job.status).all())
+        retries = db.session.query(db.func.sum(Job.attempts - 1)).scalar() or 0
+        unsent = Notification.query.filter_by(sent_at=None).count()
+    sent = sum(r["sent"] for r in results)
+    notifications = sum(r["notifications"] for r in results)
+    print(f"fan-out with {args.workers} worker(s): {elapsed:.2f}s, {sent} messages carrying {notifications} "
+          f"notifications ({notifications / max(sent, 1):.1f} per message)")
+    print(f"  {sent / elapsed:.0f} messages/s, {notifications / elapsed:.0f} notifications/s")
+    print(f"  jobs: {statuses}, {retries} retries, {unsent} notifications unsent")
+    if unsent or statuses.get("dead"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""Concurrent write throughput with and without the SQLite production settings.
+
+    python bench_writes.py --processes 4 --threads 8 --seconds 10
+
+Each mode gets a fresh copy of a database seeded by bench.py's cache. In
+every process (standing in for a gunicorn worker) each thread loops over a
+mix of registrations, new bookings and Accept/Reject responses until time
+runs out. The modes:
+
+* ``before`` -- rollback journal, synchronous=FULL, no mmap, SQLAlchemy's
+  default pool: how the app ran before database.py
+* ``after`` -- the defaults from database.py and app.py
+
+Reported per mode: completed writes per second, p50/p95 latency, and how
+many requests failed (HTTP 5xx, almost always "database is locked").
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+
+from bench import percentile, prepare_db
+
+MODES = {
+    "before": {"DB_JOURNAL_MODE": "DELETE", "DB_SYNCHRONOUS": "FULL", "DB_BUSY_TIMEOUT_MS": "", "DB_MMAP_SIZE": "",
+               "DB_POOL_SIZE": "5", "DB_MAX_OVERFLOW": "10"},
+    "after": {},
+}
+MIX = [("register", 20), ("create_booking", 30), ("respond", 50)]
+
+
+# ---------------- ONE WORKER (child process) ---------------- #
+def run_worker(job):
+    from app import app
+
+    app.logger.disabled = not os.environ.get("BENCH_LOG")  # failed writes are counted, not logged
+    app.test_client().get("/")
+    latencies, outcomes = [], Counter()
+    lock = threading.Lock()
+    start_at = job["start_at"]
+    stop_at = start_at + job["seconds"]
+
+    def loop(thread_no):
+        rnd = random.Random(thread_no)
+        client = app.test_client()
+        pairs = job["pairs"][thread_no::job["threads"]]
+        landowners = job["landowners"]
+        time.sleep(max(0.0, start_at - time.time()))
+        i = 0
+        while time.time() < stop_at:
+            i += 1
+            op = rnd.choices([name for name, _ in MIX], weights=[w for _, w in MIX])[0]
+            if op == "respond" and not pairs:
+                op = "create_booking"
+            started = time.perf_counter()
+            try:
+                if op == "register":
+                    r = client.post("/register/labor", data={
+                        "username": f"w{job['worker']}-{thread_no}-{i}-{time.time_ns()}", "password": "pass",
+                        "name": "Bench Labor", "address": "Coimbatore", "contact": "9000000000",
+                        "skills": "Harvesting", "outstation": "no"})
+                elif op == "create_booking":
+                    with client.session_transaction() as s:
+                        s["user_id"] = rnd.choice(landowners)
+                    r = client.post("/landowner", data={
+                        "service_date": "2026-06-01", "days": "2", "service_type": rnd.choice(["labor", "both"]),
+                        "num_labor": "3", "machine_type": "Tractor", "skill": "Harvesting"})
+                else:
+                    user_id, booking_id = pairs.pop()
+                    with client.session_transaction() as s:
+                        s["user_id"] = user_id
+                    r = client.post(f"/bookings/{booking_id}/response",
+                                    json={"response": rnd.choice(["Accept", "Reject"])})
+                outcome = "error" if r.status_code >= 500 else "ok"
+            except Exception:
+                outcome = "error"
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                outcomes[f"{op} {outcome}"] += 1
+                if outcome == "ok":
+                    latencies.append(elapsed)
+
+    threads = [threading.Thread(target=loop, args=(n,)) for n in range(job["threads"])]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return {"outcomes": dict(outcomes), "latencies": latencies}
+
+
+# ---------------- DRIVER ---------------- #
+def race_inputs(path, needed):
+    conn = sqlite3.connect(path)
+    landowners = [uid for (uid,) in conn.execute("SELECT id FROM user WHERE role = 'landowner'")]
+    pairs = conn.execute(
+        "SELECT e.user_id, e.booking_id FROM booking_eligibility e "
+        "WHERE NOT EXISTS (SELECT 1 FROM booking_response r WHERE r.booking_id = e.booking_id AND r.user_id = e.user_id) "
+        "ORDER BY random() LIMIT ?", (needed,)).fetchall()
+    conn.close()
+    return landowners, pairs
+
+
+def run_mode(mode, args):
+    path = prepare_db(args.size, args.data_dir, args.seed)
+    landowners, pairs = race_inputs(path, 200 * args.processes * args.threads)
+    env = dict(os.environ, DATABASE_URL="sqlite:///" + path, **MODES[mode])
+    start_at = time.time() + 3  # let every process import the app first
+    children = []
+    for worker in range(args.processes):
+        job = {"worker": worker, "threads": args.threads, "seconds": args.seconds, "start_at": start_at,
+               "landowners": landowners, "pairs": pairs[worker::args.processes]}
+        children.append(subprocess.Popen([sys.executable, os.path.abspath(__file__), "--child"], env=env,
+                                         stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True))
+        children[-1].stdin.write(json.dumps(job))
+        children[-1].stdin.close()
+    outcomes, latencies = Counter(), []
+    for child in children:
+        result = json.loads(child.stdout.read())
+        child.wait()
+        outcomes.update(result["outcomes"])
+        latencies.extend(result["latencies"])
+    ok = sum(n for key, n in outcomes.items() if key.endswith(" ok"))
+    errors = sum(n for key, n in outcomes.items() if key.endswith(" error"))
+    return {"writes_per_s": round(ok / args.seconds, 1), "ok": ok, "errors": errors,
+            "p50_ms": round(percentile(latencies, 50), 2), "p95_ms": round(percentile(latencies, 95), 2),
+            "outcomes": dict(outcomes)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8, help="threads per process")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--size", type=int, default=10000, help="bookings in the seeded database")
+    parser.add_argument("--modes", default="before,after")
+    parser.add_argument("--data-dir", default=os.path.join("/tmp", "krishikaya-bench"))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        json.dump(run_worker(json.load(sys.stdin)), sys.stdout)
+        return
+
+    print(f"{args.processes} processes x {args.threads} threads, {args.seconds:g}s per mode, {args.size} bookings")
+    print(f"  {'mode':<8}{'writes/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}")
+    for mode in args.modes.split(","):
+        r = run_mode(mode, args)
+        print(f"  {mode:<8}{r['writes_per_s']:>10.1f}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['errors']:>8}")
+
+
+if __name__ == "__main__":
+    main()
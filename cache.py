@@ -0,0 +1,179 @@
+"""Versioned fragment cache.
+
+Cached values are rendered HTML fragments (strings) whose keys include the
+version counters of the data they were built from, e.g.
+``admin:bookings:bookings=12;users:landowner=3``. Writers bump a counter
+after committing, so the next read computes a new key and stale entries
+simply age out of the LRU; nothing is ever deleted explicitly.
+
+Backends, chosen with ``from_url``:
+
+* ``memory://`` -- in-process LRU, enough for a single worker
+* ``sqlite:///path/to/cache.db`` -- one file shared by every worker and
+  process on the host
+
+Counters live in the backend too, so every worker sees the same versions.
+Each backend also has an ``epoch``, a token that changes whenever its counters
+may have started again from zero (a new process or a wiped file), so
+anything keyed on counters, such as an ETag, should include it.
+"""
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import database
+
+
+class MemoryCache:
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.counters = {}
+        self.lock = threading.Lock()
+        self.started = uuid.uuid4().hex
+
+    def epoch(self):
+        # forked workers inherit the counters and then diverge
+        return f"{self.started}:{os.getpid()}"
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def incr(self, name):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+            return self.counters[name]
+
+    def counters_for(self, names):
+        with self.lock:
+            return {name: self.counters.get(name, 0) for name in names}
+
+
+class SqliteCache:
+    def __init__(self, path, max_entries=256):
+        self.path = path
+        self.max_entries = max_entries
+        self.connections = database.LocalConnections(path)
+        conn = sqlite3.connect(path, timeout=5)
+        with conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT, used REAL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_entries_used ON entries (used)")
+            conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        conn.close()
+
+    def epoch(self):
+        conn = self.connections.get()
+        row = conn.execute("SELECT value FROM meta WHERE name = 'epoch'").fetchone()
+        if row is None:
+            with conn:
+                conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('epoch', ?)", (uuid.uuid4().hex,))
+            row = conn.execute("SELECT value FROM meta WHERE name = 'epoch'").fetchone()
+        return row[0]
+
+    def get(self, key):
+        conn = self.connections.get()
+        row = conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        with conn:
+            conn.execute("UPDATE entries SET used = ? WHERE key = ?", (time.time(), key))
+        return row[0]
+
+    def set(self, key, value):
+        with self.connections.get() as conn:
+            conn.execute("INSERT OR REPLACE INTO entries (key, value, used) VALUES (?, ?, ?)", (key, value, time.time()))
+            conn.execute(
+                "DELETE FROM entries WHERE key IN "
+                "(SELECT key FROM entries ORDER BY used DESC LIMIT -1 OFFSET ?)", (self.max_entries,)
+            )
+
+    def incr(self, name):
+        with self.connections.get() as conn:
+            conn.execute(
+                "INSERT INTO counters (name, value) VALUES (?, 1) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + 1", (name,)
+            )
+            return conn.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()[0]
+
+    def counters_for(self, names):
+        names = list(names)
+        rows = self.connections.get().execute(
+            f"SELECT name, value FROM counters WHERE name IN ({', '.join('?' * len(names))})", names
+        ).fetchall()
+        found = dict(rows)
+        return {name: found.get(name, 0) for name in names}
+
+
+class TTLCache:
+    """In-process dict whose entries expire ``ttl`` seconds after they're set.
+
+    For small per-worker lookups (e.g. the logged-in user) where a few seconds
+    of staleness across workers is fine and the local copy is dropped on write.
+    """
+
+    def __init__(self, ttl, max_entries=4096):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def pop(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+
+def from_url(url, max_entries=256):
+    if url.startswith("memory://"):
+        return MemoryCache(max_entries)
+    if url.startswith("sqlite:///"):
+        return SqliteCache(url[len("sqlite:///"):], max_entries)
+    raise ValueError(f"unsupported CACHE_URL {url!r}")
+
+
+def version_key(backend, names):
+    """"name=version;..." for the counters a fragment depends on."""
+    return ";".join(f"{name}={version}" for name, version in sorted(backend.counters_for(names).items()))
+
+
+def cached(backend, key, depends_on, build):
+    """Value for ``key`` at the current versions of ``depends_on``, building and storing it on a miss."""
+    full_key = f"{key}:{version_key(backend, depends_on)}"
+    value = backend.get(full_key)
+    if value is None:
+        value = build()
+        backend.set(full_key, value)
+    return value
@@ -0,0 +1,165 @@
+"""Check the stored and derived booking statuses against the original per-booking computation.
+
+    python check_statuses.py --bookings 2000
+    python check_statuses.py --db /tmp/krishikaya-10k.db
+
+The dashboards used to work out each booking's status on every render, with
+a handful of queries per booking over its BookingResponse rows. They now
+read the counters and status columns kept on Booking. This seeds a fresh
+database (or opens --db) and, for every booking, compares:
+
+* the landowner/admin status (``booking_status`` and the stored columns)
+* the labor feed's row status (``labor_row_status``)
+* the machinery feed's row status (``machinery_row_status``)
+
+with the old computation, reproduced below from the response rows alone.
+"Rejected" means every worker who could see the booking declined it, so the
+reference counts the workers it is routed to, as the dashboards have done
+since routing replaced "every worker of the role".
+
+Prints the first mismatches and exits non-zero if there are any.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+from seed import seed
+
+
+# ---------------- REFERENCE (the original per-booking computation) ---------------- #
+def reference(b, responses, pools):
+    """{"landowner": ..., "labor": ..., "machinery": ...} for booking ``b``.
+
+    ``responses``: {role: [(response, name), ...]} in the order they came in;
+    ``pools``: {role: workers the booking is routed to}.
+    """
+    stype = (b.service_type or "").strip().lower()
+    num_labor = int(b.num_labor) if b.num_labor else 0
+    lab_names = [name for response, name in responses.get("labor", []) if response == "Accept"]
+    lab_rejected = sum(1 for response, _ in responses.get("labor", []) if response == "Reject")
+    mach_names = [name for response, name in responses.get("machinery", []) if response == "Accept"]
+    mach_rejected = sum(1 for response, _ in responses.get("machinery", []) if response == "Reject")
+
+    # ---- landowner: labor status ----
+    if stype in ("labor", "both") and num_labor > 0:
+        if len(lab_names) >= num_labor:
+            labor_status = f"Confirmed ({', '.join(lab_names)})"
+        elif lab_rejected >= pools["labor"] and pools["labor"] > 0:
+            labor_status = "Rejected"
+        else:
+            labor_status = f"{len(lab_names)}/{num_labor} Accepted"
+    else:
+        labor_status = "N/A"
+
+    # ---- landowner: machinery status ----
+    if stype in ("machinery", "both"):
+        if mach_names:
+            machinery_status = f"Confirmed ({', '.join(mach_names)})"
+        elif mach_rejected >= pools["machinery"] and pools["machinery"] > 0:
+            machinery_status = "Rejected"
+        else:
+            machinery_status = "Pending"
+    else:
+        machinery_status = "N/A"
+
+    closed = lambda status: status.startswith("Confirmed") or status == "Rejected"
+    if stype == "both":
+        action = "Closed" if closed(labor_status) and closed(machinery_status) else "Pending"
+    elif stype == "labor":
+        action = "Closed" if closed(labor_status) else "Pending"
+    elif stype == "machinery":
+        action = "Closed" if closed(machinery_status) else "Pending"
+    else:
+        action = "Pending"
+
+    # ---- labor feed row ----
+    if num_labor > 0:
+        if len(lab_names) >= num_labor:
+            lab_row = "Confirmed"
+        elif lab_rejected >= pools["labor"] and pools["labor"] > 0:
+            lab_row = "Rejected"
+        else:
+            lab_row = f"{len(lab_names)}/{num_labor} Accepted"
+    else:
+        lab_row = "Pending"
+
+    # ---- machinery feed row ----
+    if mach_names:
+        mach_row, mach_open = "Confirmed", False
+    elif mach_rejected >= pools["machinery"] and pools["machinery"] > 0:
+        mach_row, mach_open = "Rejected", False
+    else:
+        mach_row, mach_open = "Pending", True
+
+    return {
+        "landowner": {"labor_status": labor_status, "machinery_status": machinery_status, "action": action},
+        "labor": {"accepted_count": len(lab_names), "status": lab_row,
+                  "open_for_more": not (num_labor > 0 and len(lab_names) >= num_labor)},
+        "machinery": {"accepted_names": mach_names, "status": mach_row, "open_for_more": mach_open},
+    }
+
+
+# ---------------- CHECK ---------------- #
+def check():
+    """Compare every booking; returns the list of mismatches."""
+    from collections import defaultdict
+
+    from app import (Booking, BookingEligibility, BookingResponse, User, accepted_names, booking_status, db,
+                     labor_row_status, machinery_row_status)
+
+    responses = defaultdict(lambda: defaultdict(list))
+    rows = (db.session.query(BookingResponse.booking_id, BookingResponse.user_role, BookingResponse.response, User.name)
+            .join(User, User.id == BookingResponse.user_id).order_by(BookingResponse.id))
+    for booking_id, role, response, name in rows:
+        responses[booking_id][role].append((response, name))
+    pools = defaultdict(lambda: {"labor": 0, "machinery": 0})
+    routed = (db.session.query(BookingEligibility.booking_id, User.role, db.func.count())
+              .join(User, User.id == BookingEligibility.user_id).group_by(BookingEligibility.booking_id, User.role))
+    for booking_id, role, n in routed:
+        if role in ("labor", "machinery"):
+            pools[booking_id][role] = n
+    machinery_names = accepted_names(db.select(Booking.id), "machinery")
+
+    mismatches = []
+    for b in Booking.query.order_by(Booking.id).yield_per(1000):
+        expected = reference(b, responses[b.id], pools[b.id])
+        actual = {
+            "landowner": booking_status(b),
+            "stored": {"labor_status": b.labor_status, "machinery_status": b.machinery_status, "action": b.action},
+            "labor": labor_row_status(b),
+            "machinery": machinery_row_status(b, machinery_names.get(b.id, [])),
+        }
+        expected["stored"] = expected["landowner"]
+        for view, want in expected.items():
+            if actual[view] != want:
+                mismatches.append((b.id, view, want, actual[view]))
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--db", help="check this database instead of seeding a fresh one")
+    parser.add_argument("--bookings", type=int, default=2000, help="bookings to seed")
+    parser.add_argument("--seed", type=int, default=0, help="random seed, for reproducible data")
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(prefix="krishikaya-statuses-"), "statuses.db")
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.abspath(path)
+    from app import Booking, app, setup
+    with app.app_context():
+        if args.db:
+            setup()
+        else:
+            seed(args.bookings, random_seed=args.seed, echo=lambda *a: None)
+        mismatches = check()
+        total = Booking.query.count()
+    for booking_id, view, want, got in mismatches[:10]:
+        print(f"booking {booking_id} {view}:\n  expected {want}\n  got      {got}")
+    print(f"{total} booking(s) checked, {len(mismatches)} mismatch(es)")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
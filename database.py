@@ -0,0 +1,107 @@
+"""SQLite production settings and read/write routing for the app's engines.
+
+``init_app(app, db)`` applies ``SQLITE_PRAGMAS`` to every new SQLite
+connection through an engine ``connect`` event. The defaults are WAL
+journaling, ``synchronous=NORMAL``, a busy timeout and a memory map, so
+concurrent writers queue briefly instead of failing with "database is
+locked" and readers never block the writer.
+
+It also makes forked workers (``gunicorn --preload``) drop the pooled
+connections they inherited from the master without closing them, since
+closing would also close the master's.
+
+If ``SQLALCHEMY_BINDS`` has a ``read`` engine (``DATABASE_READ_URL``), views
+wrapped in ``read_only`` send their GET queries there, through
+``RoutingSession``. For SQLite that is usually the same file opened
+read-only, e.g. ``sqlite:///file:/srv/krishikaya.db?mode=ro&uri=true``, so
+dashboard reads get their own pool and can't exhaust the one that writes
+use. Writes and flushes always go to the primary engine.
+"""
+import functools
+import os
+import sqlite3
+import threading
+
+from flask import g, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import Delete, Insert, Update, event
+
+READ_BIND = "read"
+
+
+class LocalConnections:
+    """Plain sqlite3 connections to one file, for the side stores in cache.py and events.py.
+
+    ``get()`` returns this thread's connection, opening a new one after a
+    fork rather than sharing the parent's.
+    """
+
+    def __init__(self, path, timeout=5):
+        self.path = path
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def get(self):
+        if getattr(self.local, "pid", None) != os.getpid():
+            self.local.conn = sqlite3.connect(self.path, timeout=self.timeout)
+            self.local.pid = os.getpid()
+        return self.local.conn
+
+
+def pragmas_from_env(environ=os.environ):
+    """SQLITE_PRAGMAS from DB_* variables; an empty value leaves that pragma at SQLite's default."""
+    pragmas = {
+        "journal_mode": environ.get("DB_JOURNAL_MODE", "WAL"),
+        "synchronous": environ.get("DB_SYNCHRONOUS", "NORMAL"),
+        "busy_timeout": environ.get("DB_BUSY_TIMEOUT_MS", "5000"),
+        "mmap_size": environ.get("DB_MMAP_SIZE", str(256 * 1024 * 1024)),
+    }
+    return {name: value for name, value in pragmas.items() if value}
+
+
+def _apply_pragmas(pragmas, read_only):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            # journal mode lives in the file; only the primary may change it
+            if not (read_only and name == "journal_mode"):
+                cursor.execute(f"PRAGMA {name}={value}")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+    return on_connect
+
+
+def init_app(app, db):
+    app.config.setdefault("SQLITE_PRAGMAS", pragmas_from_env())
+    with app.app_context():
+        engines = dict(db.engines)
+
+    for key, engine in engines.items():
+        if engine.dialect.name == "sqlite":
+            event.listen(engine, "connect", _apply_pragmas(app.config["SQLITE_PRAGMAS"], key == READ_BIND))
+
+    def dispose_inherited_pools():
+        for engine in engines.values():
+            engine.dispose(close=False)
+
+    os.register_at_fork(after_in_child=dispose_inherited_pools)
+
+
+class RoutingSession(Session):
+    """Session that reads from the ``read`` bind inside ``read_only`` GET views."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and g.get("read_only") and not self._flushing
+                and not isinstance(clause, (Insert, Update, Delete)) and READ_BIND in self._db.engines):
+            return self._db.engines[READ_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def read_only(view):
+    """Serve the view's GET requests from the read pool, when one is configured."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        g.read_only = request.method in ("GET", "HEAD")
+        return view(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,116 @@
+"""Booking status events for live dashboards.
+
+Writers ``publish`` an event after committing; every ``/events`` stream reads
+the events newer than the last id it sent, so a browser that reconnects with
+``Last-Event-ID`` picks up where it left off. Ids are strings and only ever
+compared by the broker that issued them. The memory broker's ids start with
+a per-process epoch, so an id from before a restart reads from the start of
+the new buffer instead of waiting for the new ids to catch up with it.
+
+Brokers, chosen with ``from_url``:
+
+* ``memory://`` -- in-process ring buffer; only streams served by the same
+  worker see an event, so use it with a single (threaded) worker
+* ``sqlite:///path/to/events.db`` -- one file every worker on the host
+  appends to and polls
+
+``cursor(last_event_id)`` turns the client's ``Last-Event-ID`` header, which
+may be missing or garbage, into the id a stream starts reading after.
+
+Only the newest ``max_events`` are kept; a stream that falls further behind
+than that just misses the oldest, and the next page load catches up.
+"""
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+
+import database
+
+
+class MemoryBroker:
+    def __init__(self, max_events=1000):
+        self.events = deque(maxlen=max_events)
+        self.next_id = 1
+        self.changed = threading.Condition()
+        self.epoch = uuid.uuid4().hex[:8]
+
+    def _id(self, seq):
+        return f"{self.epoch}-{seq}"
+
+    def _seq(self, event_id):
+        # 0 for ids issued before a restart, or by anything else
+        epoch, _, seq = (event_id or "").rpartition("-")
+        return int(seq) if epoch == self.epoch and seq.isdigit() else 0
+
+    def publish(self, data):
+        with self.changed:
+            event_id = self.next_id
+            self.next_id += 1
+            self.events.append((event_id, data))
+            self.changed.notify_all()
+        return self._id(event_id)
+
+    def last_id(self):
+        with self.changed:
+            return self._id(self.next_id - 1)
+
+    def cursor(self, event_id):
+        # ids from another epoch are kept: read() starts them at the beginning of the buffer
+        return event_id or self.last_id()
+
+    def read(self, after, timeout):
+        after = self._seq(after)
+        with self.changed:
+            self.changed.wait_for(lambda: self.next_id - 1 > after, timeout)
+            return [(self._id(i), data) for i, data in self.events if i > after]
+
+
+class SqliteBroker:
+    poll_interval = 0.25
+
+    def __init__(self, path, max_events=1000):
+        self.path = path
+        self.max_events = max_events
+        self.connections = database.LocalConnections(path)
+        conn = sqlite3.connect(path, timeout=5)
+        with conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS events (id INTEGER PRIMARY KEY AUTOINCREMENT, data TEXT NOT NULL)")
+        conn.close()
+
+    def publish(self, data):
+        with self.connections.get() as conn:
+            event_id = conn.execute("INSERT INTO events (data) VALUES (?)", (json.dumps(data),)).lastrowid
+            conn.execute("DELETE FROM events WHERE id <= ?", (event_id - self.max_events,))
+        return str(event_id)
+
+    def last_id(self):
+        row = self.connections.get().execute("SELECT max(id) FROM events").fetchone()
+        return str(row[0] or 0)
+
+    def cursor(self, event_id):
+        # Last-Event-ID comes from the client: anything unreadable means "from now on"
+        try:
+            return str(int(event_id))
+        except (TypeError, ValueError):
+            return self.last_id()
+
+    def read(self, after, timeout):
+        after = int(self.cursor(after))
+        deadline = time.monotonic() + timeout
+        while True:
+            rows = self.connections.get().execute("SELECT id, data FROM events WHERE id > ? ORDER BY id", (after,)).fetchall()
+            if rows or time.monotonic() >= deadline:
+                return [(str(i), json.loads(data)) for i, data in rows]
+            time.sleep(self.poll_interval)
+
+
+def from_url(url, max_events=1000):
+    if url.startswith("memory://"):
+        return MemoryBroker(max_events)
+    if url.startswith("sqlite:///"):
+        return SqliteBroker(url[len("sqlite:///"):], max_events)
+    raise ValueError(f"unsupported EVENTS_URL {url!r}")
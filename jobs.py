@@ -0,0 +1,127 @@
+"""Durable background jobs kept in the app's own SQLite database.
+
+Jobs are rows of a model with the columns of ``app.Job``. ``enqueue`` adds
+one to the caller's session, so it commits or rolls back together with the
+write that caused it: a job exists exactly when its booking does.
+
+A worker (``flask work-jobs``) repeatedly claims a batch of due jobs with one
+``UPDATE ... RETURNING`` that marks them running under a lease, runs each
+handler and commits the handler's writes together with the job's new state.
+A job whose worker died is claimed again once its lease runs out, so
+handlers must be idempotent; delivery is at least once.
+
+* a failing job is retried with exponential backoff and jitter, and marked
+  ``dead`` after ``max_attempts``
+* ``key`` dedupes: while a job with that key is queued, enqueueing another
+  one is a no-op (a partial unique index over queued jobs)
+* finished jobs are pruned ``keep`` seconds after they were created
+"""
+import json
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+
+
+def backoff_delay(attempts, base, cap):
+    """Seconds before retry number ``attempts``: base, 2 * base, 4 * base ... up to cap, jittered down by up to half."""
+    return min(base * 2 ** (attempts - 1), cap) * random.uniform(0.5, 1.0)
+
+
+class Queue:
+    def __init__(self, db, model, max_attempts=8, backoff=30, max_backoff=3600, lease=300, keep=86400):
+        self.db = db
+        self.table = model.__table__
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.lease = lease
+        self.keep = keep
+
+    def enqueue(self, kind, payload, key=None, delay=0):
+        """Add a job to the current session; the caller commits."""
+        self.enqueue_many(kind, [payload], [key], delay)
+
+    def enqueue_many(self, kind, payloads, keys=None, delay=0):
+        """Add one job per payload with a single executemany; the caller commits."""
+        now = datetime.utcnow()
+        keys = keys or [None] * len(payloads)
+        rows = [{"kind": kind, "payload": json.dumps(payload), "key": key, "status": "queued", "attempts": 0,
+                 "run_at": now + timedelta(seconds=delay), "created_at": now} for payload, key in zip(payloads, keys)]
+        if rows:
+            self.db.session.execute(sqlite_insert(self.table).on_conflict_do_nothing(), rows)
+
+    def claim(self, worker, limit):
+        """Lease up to ``limit`` due jobs to ``worker`` and commit; returns their rows."""
+        t = self.table
+        now = datetime.utcnow()
+        due = (
+            self.db.select(t.c.id)
+            .where(self.db.or_(
+                self.db.and_(t.c.status == "queued", t.c.run_at <= now),
+                self.db.and_(t.c.status == "running", t.c.locked_until < now),
+            ))
+            .order_by(t.c.run_at, t.c.id).limit(limit)
+        )
+        jobs = self.db.session.execute(
+            t.update().where(t.c.id.in_(due))
+            .values(status="running", locked_by=worker, locked_until=now + timedelta(seconds=self.lease),
+                    attempts=t.c.attempts + 1)
+            .returning(t.c.id, t.c.kind, t.c.payload, t.c.key, t.c.attempts)
+        ).all()
+        self.db.session.commit()
+        return sorted(jobs, key=lambda job: job.id)
+
+    def finish(self, job):
+        """Mark ``job`` done and commit, together with whatever its handler wrote."""
+        t = self.table
+        self.db.session.execute(t.update().where(t.c.id == job.id).values(status="done", locked_until=None))
+        self.db.session.commit()
+
+    def fail(self, job, error):
+        """Schedule a retry of ``job``, or mark it dead once it has used up its attempts, and commit."""
+        t = self.table
+        self.db.session.rollback()
+        if job.attempts >= self.max_attempts:
+            changes = {"status": "dead"}
+        else:
+            run_at = datetime.utcnow() + timedelta(seconds=backoff_delay(job.attempts, self.backoff, self.max_backoff))
+            changes = {"status": "queued", "run_at": run_at}
+        try:
+            self.db.session.execute(t.update().where(t.c.id == job.id).values(
+                locked_until=None, last_error=error[:2000], **changes))
+            self.db.session.commit()
+        except IntegrityError:
+            # an identical job was queued meanwhile and will do the same work
+            self.db.session.rollback()
+            self.db.session.execute(t.update().where(t.c.id == job.id).values(
+                status="superseded", locked_until=None, last_error=error[:2000]))
+            self.db.session.commit()
+
+    def work_once(self, handlers, worker, batch=100):
+        """Claim and run one batch of due jobs; returns how many ran."""
+        jobs = self.claim(worker, batch)
+        for job in jobs:
+            try:
+                handlers[job.kind](json.loads(job.payload))
+            except Exception as e:
+                self.fail(job, f"{type(e).__name__}: {e}")
+            else:
+                self.finish(job)
+        return len(jobs)
+
+    def prune(self):
+        """Delete finished jobs created more than ``keep`` seconds ago and commit; returns how many."""
+        t = self.table
+        deleted = self.db.session.execute(t.delete().where(
+            t.c.status.in_(["done", "superseded"]),
+            t.c.created_at < datetime.utcnow() - timedelta(seconds=self.keep),
+        )).rowcount
+        self.db.session.commit()
+        return deleted
+
+    def counts(self):
+        """{status: number of jobs}."""
+        t = self.table
+        return dict(self.db.session.execute(self.db.select(t.c.status, self.db.func.count()).group_by(t.c.status)).all())
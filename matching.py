@@ -0,0 +1,109 @@
+"""Routing of bookings to the laborers and machinery owners who can take them.
+
+``EligibilityIndex`` keeps inverted indexes over the registered workers:
+
+* machinery owners by machine-type token ("Mini Tractor" -> mini, tractor)
+* laborers by skill token ("Tractor Operation, Harvesting" -> tractor, harvest)
+* laborers by place (comma separated parts of the address) and whether
+  they are ready to work outstation
+
+A laborer is eligible when they have one of the booking's skill tokens (any
+laborer if the booking names no skill) and either works outstation or shares
+a place with the landowner. A machinery owner is eligible when their machine
+type shares a token with the booking's (any owner if the booking names none).
+
+The index only holds ids and tokens, not ORM objects, and users are only ever
+added, so a worker process can catch up with registrations made elsewhere by
+feeding it every user with an id above ``last_user_id``.
+"""
+import re
+
+STOP_WORDS = {"and", "with", "for", "the", "of", "in", "work", "works", "operation", "experience", "years"}
+
+
+def tokens(text):
+    """Lowercased, lightly stemmed word tokens of a skills or machine type string."""
+    found = set()
+    for word in re.findall(r"[a-z]+", (text or "").lower()):
+        if word in STOP_WORDS or len(word) < 3:
+            continue
+        if word.endswith("ing") and len(word) > 5:
+            word = word[:-3]
+        elif word.endswith("s") and len(word) > 3:
+            word = word[:-1]
+        found.add(word)
+    return found
+
+
+def places(address):
+    """Normalized comma separated parts of an address, e.g. {"gandhi nagar", "pollachi"}."""
+    parts = (" ".join(part.split()).lower() for part in (address or "").split(","))
+    return {part for part in parts if part and not part.isdigit()}
+
+
+def willing_outstation(user):
+    return (user.outstation or "").strip().lower() == "yes"
+
+
+class EligibilityIndex:
+    def __init__(self):
+        self.last_user_id = 0
+        self.labor = set()
+        self.machinery = set()
+        self.outstation = set()
+        self.by_skill = {}
+        self.by_place = {}
+        self.by_machine = {}
+
+    def add(self, user):
+        """Index a newly registered user; other roles only advance ``last_user_id``."""
+        self.last_user_id = max(self.last_user_id, user.id)
+        if user.role == "labor":
+            self.labor.add(user.id)
+            if willing_outstation(user):
+                self.outstation.add(user.id)
+            for token in tokens(user.skills):
+                self.by_skill.setdefault(token, set()).add(user.id)
+            for place in places(user.address):
+                self.by_place.setdefault(place, set()).add(user.id)
+        elif user.role == "machinery":
+            self.machinery.add(user.id)
+            for token in tokens(user.machine_type):
+                self.by_machine.setdefault(token, set()).add(user.id)
+
+    def laborers_for(self, skill, landowner_address):
+        wanted = tokens(skill)
+        if wanted:
+            skilled = set().union(*(self.by_skill.get(t, ()) for t in wanted))
+        else:
+            skilled = self.labor
+        nearby = set().union(*(self.by_place.get(p, ()) for p in places(landowner_address)))
+        return skilled & (self.outstation | nearby)
+
+    def machinery_for(self, machine_type):
+        wanted = tokens(machine_type)
+        if not wanted:
+            return set(self.machinery)
+        return set().union(*(self.by_machine.get(t, ()) for t in wanted))
+
+    def eligible(self, booking, landowner_address):
+        """{"labor": ids, "machinery": ids} a booking should be routed to."""
+        stype = (booking.service_type or "").strip().lower()
+        return {
+            "labor": self.laborers_for(booking.skill, landowner_address) if stype in ("labor", "both") else set(),
+            "machinery": self.machinery_for(booking.machine_type) if stype in ("machinery", "both") else set(),
+        }
+
+
+def matches(user, booking, landowner_address):
+    """Whether one user is eligible for one booking, by the same rules as the index."""
+    stype = (booking.service_type or "").strip().lower()
+    if user.role == "labor" and stype in ("labor", "both"):
+        wanted = tokens(booking.skill)
+        skilled = not wanted or bool(wanted & tokens(user.skills))
+        nearby = willing_outstation(user) or bool(places(user.address) & places(landowner_address))
+        return skilled and nearby
+    if user.role == "machinery" and stype in ("machinery", "both"):
+        wanted = tokens(booking.machine_type)
+        return not wanted or bool(wanted & tokens(user.machine_type))
+    return False
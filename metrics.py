@@ -0,0 +1,145 @@
+"""Per-request SQL and render timing, exposed in Prometheus text format.
+
+``init_app(app)`` hooks SQLAlchemy engine events and the Flask request and
+template signals, and records for every endpoint:
+
+* total request latency
+* number of SQL statements and time spent in them
+* template render time
+
+They're served as histograms on ``/metrics``. Numbers are per process; with
+several gunicorn workers each scrape sees the worker that answered it, so
+scrape each worker or sum over the ``instance`` label.
+
+Setting ``SLOW_REQUEST_MS`` logs every request slower than that with the SQL
+it ran.
+"""
+import threading
+import time
+
+from flask import Response, g, has_app_context, request, template_rendered, before_render_template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+MAX_LOGGED_STATEMENTS = 50
+
+
+class Histogram:
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.series = {}  # endpoint -> [count per bucket..., sum, count]
+        self.lock = threading.Lock()
+
+    def observe(self, endpoint, value):
+        with self.lock:
+            series = self.series.setdefault(endpoint, [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for endpoint, series in sorted(self.series.items()):
+                label = f'endpoint="{_escape(endpoint)}"'
+                for bound, n in zip(self.buckets, series):
+                    lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {n}')
+                lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {series[-1]}')
+                lines.append(f"{self.name}_sum{{{label}}} {series[-2]:.6f}")
+                lines.append(f"{self.name}_count{{{label}}} {series[-1]}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUEST_SECONDS = Histogram("krishikaya_request_duration_seconds", "Total request latency.", LATENCY_BUCKETS)
+DB_SECONDS = Histogram("krishikaya_request_db_seconds", "Time spent in SQL per request.", LATENCY_BUCKETS)
+QUERIES = Histogram("krishikaya_request_queries", "SQL statements executed per request.", QUERY_BUCKETS)
+RENDER_SECONDS = Histogram("krishikaya_request_render_seconds", "Template render time per request.", LATENCY_BUCKETS)
+HISTOGRAMS = (REQUEST_SECONDS, DB_SECONDS, QUERIES, RENDER_SECONDS)
+
+
+def _current():
+    """The stats dict for the request in progress, or None outside a request."""
+    return g.get("_request_stats") if has_app_context() else None
+
+
+# ---------------- SQLALCHEMY ---------------- #
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    stats = _current()
+    if stats is None:
+        return
+    stats["queries"] += 1
+    stats["db"] += elapsed
+    if stats["statements"] is not None and len(stats["statements"]) < MAX_LOGGED_STATEMENTS:
+        stats["statements"].append((elapsed, statement))
+
+
+# ---------------- FLASK ---------------- #
+def _before_render(sender, template, context, **extra):
+    stats = _current()
+    if stats is not None:
+        stats["render_start"].append(time.perf_counter())
+
+
+def _rendered(sender, template, context, **extra):
+    stats = _current()
+    if stats is not None and stats["render_start"]:
+        stats["render"] += time.perf_counter() - stats["render_start"].pop()
+
+
+def init_app(app):
+    app.config.setdefault("SLOW_REQUEST_MS", None)
+
+    @app.before_request
+    def start_request_stats():
+        g._request_stats = {
+            "start": time.perf_counter(), "queries": 0, "db": 0.0, "render": 0.0, "render_start": [],
+            "statements": [] if app.config["SLOW_REQUEST_MS"] else None,
+        }
+
+    @app.teardown_request
+    def record_request_stats(exc):
+        stats = g.pop("_request_stats", None)
+        if stats is None:
+            return
+        total = time.perf_counter() - stats["start"]
+        endpoint = request.endpoint or "unmatched"
+        REQUEST_SECONDS.observe(endpoint, total)
+        DB_SECONDS.observe(endpoint, stats["db"])
+        QUERIES.observe(endpoint, stats["queries"])
+        RENDER_SECONDS.observe(endpoint, stats["render"])
+
+        slow_ms = app.config["SLOW_REQUEST_MS"]
+        if slow_ms and total * 1000 >= slow_ms:
+            lines = [f"  {elapsed * 1000:.1f} ms  {' '.join(sql.split())}" for elapsed, sql in stats["statements"]]
+            app.logger.warning(
+                "slow request %s %s (%s): %.0f ms, %d queries, %.0f ms SQL, %.0f ms render\n%s",
+                request.method, request.path, endpoint, total * 1000, stats["queries"],
+                stats["db"] * 1000, stats["render"] * 1000, "\n".join(lines),
+            )
+
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_rendered, app)
+
+    @app.route("/metrics")
+    def metrics():
+        lines = []
+        for histogram in HISTOGRAMS:
+            lines.extend(histogram.render())
+        return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,194 @@
+"""Versioned schema migrations for the SQLite database.
+
+``db.create_all()`` only creates missing tables, so changes to existing tables
+are listed here. The applied version is kept in SQLite's ``PRAGMA user_version``.
+Every step is written to be safe on a database that ``create_all()`` has just
+built with the current models, so fresh and old databases end up identical.
+"""
+from sqlalchemy.exc import OperationalError
+
+
+# ---------------- HELPERS ---------------- #
+def add_column(conn, table, column, ddl):
+    existing = {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})")}
+    if column not in existing:
+        conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+
+
+def create_index(conn, name, table, columns, unique=False):
+    conn.exec_driver_sql(
+        f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"
+    )
+
+
+# ---------------- MIGRATIONS ---------------- #
+def m001_booking_counters(conn):
+    for column in ("labor_accepted", "labor_rejected", "machinery_accepted", "machinery_rejected"):
+        add_column(conn, "booking", column, "INTEGER NOT NULL DEFAULT 0")
+
+
+def m002_indexes(conn):
+    # keep one response per (booking, user) before the unique index goes on
+    conn.exec_driver_sql(
+        "DELETE FROM booking_response WHERE id NOT IN "
+        "(SELECT MIN(id) FROM booking_response GROUP BY booking_id, user_id)"
+    )
+    create_index(conn, "uq_booking_response_booking_user", "booking_response", ["booking_id", "user_id"], unique=True)
+    create_index(conn, "ix_booking_response_booking_role_response", "booking_response",
+                 ["booking_id", "user_role", "response"])
+    create_index(conn, "ix_booking_response_user_booking", "booking_response", ["user_id", "booking_id"])
+    create_index(conn, "ix_booking_service_type_id", "booking", ["service_type", "id"])
+    create_index(conn, "ix_booking_landowner_id", "booking", ["landowner_id"])
+    create_index(conn, "ix_user_role", "user", ["role"])
+
+
+def m003_eligibility(conn):
+    # the booking_eligibility table itself is new, so create_all() makes it
+    add_column(conn, "booking", "skill", "VARCHAR(100)")
+    add_column(conn, "booking", "labor_pool", "INTEGER NOT NULL DEFAULT 0")
+    add_column(conn, "booking", "machinery_pool", "INTEGER NOT NULL DEFAULT 0")
+
+
+def m004_booking_dates(conn):
+    # service_date was free text: keep what SQLite reads as a date, in ISO form, and drop the rest
+    add_column(conn, "booking", "end_date", "DATE")
+    conn.exec_driver_sql("UPDATE booking SET service_date = date(service_date)")
+    conn.exec_driver_sql(
+        "UPDATE booking SET end_date = date(service_date, '+' || (max(coalesce(days, 1), 1) - 1) || ' days')"
+    )
+    create_index(conn, "ix_booking_service_date", "booking", ["service_date"])
+    create_index(conn, "ix_booking_end_date", "booking", ["end_date"])
+
+
+USER_SEARCH_COLUMNS = ("name", "address", "contact", "skills", "crops", "machine_type")
+
+
+def m005_user_search(conn):
+    # external-content FTS5 index over user; the triggers keep it in step with every write
+    if not any(row[0] == "ENABLE_FTS5" for row in conn.exec_driver_sql("PRAGMA compile_options")):
+        return  # this SQLite has no FTS5; search_users() falls back to LIKE
+    columns = ", ".join(USER_SEARCH_COLUMNS)
+    new = ", ".join(f"new.{c}" for c in USER_SEARCH_COLUMNS)
+    old = ", ".join(f"old.{c}" for c in USER_SEARCH_COLUMNS)
+    conn.exec_driver_sql(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS user_search USING fts5({columns}, "
+        "content='user', content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    conn.exec_driver_sql(
+        f"CREATE TRIGGER IF NOT EXISTS user_search_insert AFTER INSERT ON user BEGIN "
+        f"INSERT INTO user_search (rowid, {columns}) VALUES (new.id, {new}); END"
+    )
+    conn.exec_driver_sql(
+        f"CREATE TRIGGER IF NOT EXISTS user_search_delete AFTER DELETE ON user BEGIN "
+        f"INSERT INTO user_search (user_search, rowid, {columns}) VALUES ('delete', old.id, {old}); END"
+    )
+    conn.exec_driver_sql(
+        f"CREATE TRIGGER IF NOT EXISTS user_search_update AFTER UPDATE ON user BEGIN "
+        f"INSERT INTO user_search (user_search, rowid, {columns}) VALUES ('delete', old.id, {old}); "
+        f"INSERT INTO user_search (rowid, {columns}) VALUES (new.id, {new}); END"
+    )
+    conn.exec_driver_sql("INSERT INTO user_search (user_search) VALUES ('rebuild')")
+
+
+def m006_booking_timestamps(conn):
+    # booking_rollup is new, so create_all() makes it; rebuild_rollups() fills it after upgrading
+    for table in ("booking", "booking_archive"):
+        for column in ("created_at", "labor_confirmed_at", "machinery_confirmed_at"):
+            add_column(conn, table, column, "DATETIME")
+
+
+# (version, description, step) -- append only, never renumber
+MIGRATIONS = [
+    (1, "booking response counters", m001_booking_counters),
+    (2, "indexes for dashboard queries and unique response per user", m002_indexes),
+    (3, "booking skill and responder pools for eligibility routing", m003_eligibility),
+    (4, "date typed service dates and booking end dates", m004_booking_dates),
+    (5, "full-text search index over users", m005_user_search),
+    (6, "booking creation and confirmation times for analytics rollups", m006_booking_timestamps),
+]
+
+
+# representative SQL for each dashboard query, used by explain()
+DASHBOARD_QUERIES = {
+    "landowner_dashboard: own bookings":
+        "SELECT * FROM booking WHERE landowner_id = 1",
+    "labor_dashboard: booking feed":
+        "SELECT booking.* FROM booking JOIN booking_eligibility ON booking_eligibility.booking_id = booking.id "
+        "WHERE booking_eligibility.user_id = 1 AND booking_eligibility.booking_id < 1000 "
+        "ORDER BY booking_eligibility.booking_id DESC LIMIT 51",
+    "labor_dashboard: upcoming filter":
+        "SELECT booking.* FROM booking JOIN booking_eligibility ON booking_eligibility.booking_id = booking.id "
+        "WHERE booking_eligibility.user_id = 1 AND booking.service_date BETWEEN '2026-06-01' AND '2026-06-08' "
+        "ORDER BY booking_eligibility.booking_id DESC LIMIT 51",
+    "archive-bookings: finished and closed":
+        "SELECT id FROM booking WHERE end_date < '2026-06-01' AND action = 'Closed' "
+        "AND id < (SELECT max(id) FROM booking) ORDER BY id LIMIT 500",
+    "labor_dashboard: my responses":
+        "SELECT booking_id, response FROM booking_response WHERE user_id = 1 AND booking_id IN (1, 2, 3)",
+    "machinery_dashboard: accepted names":
+        "SELECT booking_response.booking_id, user.name FROM booking_response "
+        "JOIN user ON user.id = booking_response.user_id "
+        "WHERE booking_response.booking_id IN (1, 2, 3) "
+        "AND booking_response.user_role = 'machinery' AND booking_response.response = 'Accept' "
+        "ORDER BY booking_response.id",
+    "admin_dashboard: users by role":
+        "SELECT * FROM user WHERE role = 'labor' ORDER BY id DESC LIMIT 50",
+    "admin_dashboard: user search":
+        "SELECT user.* FROM user JOIN (SELECT rowid, rank FROM user_search WHERE user_search MATCH '\"ravi\"*') AS hits "
+        "ON hits.rowid = user.id WHERE user.role = 'labor' ORDER BY hits.rank LIMIT 50",
+    "admin_analytics: by district":
+        "SELECT district, sum(bookings), sum(labor_requested), sum(labor_accepted) FROM booking_rollup "
+        "WHERE month = '2026-06' GROUP BY district ORDER BY district",
+    "work-jobs: claim due jobs":
+        "SELECT id FROM job WHERE (status = 'queued' AND run_at <= '2026-06-01') "
+        "OR (status = 'running' AND locked_until < '2026-06-01') ORDER BY run_at, id LIMIT 100",
+    "deliver_notifications: pending for user":
+        "SELECT * FROM notification LEFT JOIN booking ON booking.id = notification.booking_id "
+        "WHERE notification.user_id = 1 AND notification.sent_at IS NULL ORDER BY notification.id",
+    "response POST: routed to user":
+        "SELECT 1 FROM booking_eligibility WHERE user_id = 1 AND booking_id = 1",
+    "response POST: already responded":
+        "SELECT id FROM booking_response WHERE booking_id = 1 AND user_id = 1",
+    "reconcile-counters: response counts":
+        "SELECT booking_id, user_role, response, count(id) FROM booking_response "
+        "GROUP BY booking_id, user_role, response",
+}
+
+
+# ---------------- RUNNER ---------------- #
+def current_version(conn):
+    return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def upgrade(engine, echo=None):
+    """Apply pending migrations in order, one transaction each.
+
+    Returns the versions that were applied. ``echo`` (e.g. ``print``) gets a
+    line per migration.
+    """
+    applied = []
+    with engine.connect() as conn:
+        version = current_version(conn)
+    for number, description, step in MIGRATIONS:
+        if number <= version:
+            continue
+        with engine.begin() as conn:
+            step(conn)
+            conn.exec_driver_sql(f"PRAGMA user_version = {number}")
+        applied.append(number)
+        if echo:
+            echo(f"applied {number:03d} {description}")
+    return applied
+
+
+def explain(engine):
+    """{query name: [EXPLAIN QUERY PLAN detail lines]} for DASHBOARD_QUERIES."""
+    plans = {}
+    with engine.connect() as conn:
+        for name, sql in DASHBOARD_QUERIES.items():
+            try:
+                plans[name] = [row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql)]
+            except OperationalError:
+                # table doesn't exist yet
+                plans[name] = []
+    return plans
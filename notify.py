@@ -0,0 +1,78 @@
+"""Senders that deliver notification messages to users.
+
+A ``Message`` is one batch for one recipient: a subject and a line per thing
+that happened, so a worker matched to twenty new bookings gets one SMS, not
+twenty. ``send`` either delivers it or raises; the job queue retries raises.
+
+Senders, chosen with ``from_url``:
+
+* ``log://`` -- writes each message to the ``krishikaya.notify`` logger
+* ``stub://`` -- keeps messages in ``sent`` for tests and benchmarks;
+  ``stub://?fail=0.2&delay=0.01`` fails that share of sends and sleeps that
+  many seconds per send, to exercise retries and slow gateways
+* ``http://`` or ``https://`` -- POSTs each message as JSON to an SMS or
+  email gateway's webhook
+"""
+import json
+import logging
+import random
+import threading
+import time
+import urllib.request
+from collections import namedtuple
+from urllib.parse import parse_qs, urlsplit
+
+Message = namedtuple("Message", "user_id to name subject lines")
+
+logger = logging.getLogger("krishikaya.notify")
+
+
+class SendError(Exception):
+    pass
+
+
+class LogSender:
+    def send(self, message):
+        logger.info("to %s (%s): %s\n  %s", message.name, message.to, message.subject, "\n  ".join(message.lines))
+
+
+class StubSender:
+    def __init__(self, fail=0.0, delay=0.0):
+        self.fail = fail
+        self.delay = delay
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def send(self, message):
+        if self.delay:
+            time.sleep(self.delay)
+        if self.fail and random.random() < self.fail:
+            raise SendError(f"stub failure sending to user {message.user_id}")
+        with self.lock:
+            self.sent.append(message)
+
+
+class WebhookSender:
+    def __init__(self, url, timeout=10):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, message):
+        body = json.dumps(message._asdict()).encode()
+        req = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                resp.read()
+        except OSError as e:  # URLError and HTTPError are OSErrors
+            raise SendError(f"{self.url}: {e}") from e
+
+
+def from_url(url):
+    if url.startswith("log://"):
+        return LogSender()
+    if url.startswith("stub://"):
+        options = {name: float(values[-1]) for name, values in parse_qs(urlsplit(url).query).items()}
+        return StubSender(options.get("fail", 0.0), options.get("delay", 0.0))
+    if url.startswith(("http://", "https://")):
+        return WebhookSender(url)
+    raise ValueError(f"unsupported NOTIFY_URL {url!r}")
@@ -0,0 +1,164 @@
+"""Fill a database with synthetic landowners, workers, bookings and responses.
+
+    python seed.py --db /tmp/krishikaya-10k.db --bookings 10000
+
+Worker counts scale with the number of bookings unless given explicitly.
+Bookings are routed with the real matching rules and responses only come
+from routed workers, so dashboards look like production: most bookings
+partly filled, some confirmed, a few rejected by everyone.
+
+Never point this at the live krishikaya.db; it refuses a non-empty database.
+"""
+import argparse
+import os
+import random
+from datetime import date, timedelta
+
+PLACES = [
+    "Coimbatore", "Pollachi", "Tiruppur", "Erode", "Salem", "Namakkal", "Karur", "Dindigul",
+    "Madurai", "Theni", "Tiruchirappalli", "Thanjavur", "Tiruvarur", "Nagapattinam", "Villupuram",
+    "Cuddalore", "Vellore", "Krishnagiri", "Dharmapuri", "Tirunelveli", "Thoothukudi", "Virudhunagar",
+    "Sivaganga", "Ramanathapuram", "Pudukkottai", "Ariyalur", "Perambalur", "Kallakurichi",
+    "Tenkasi", "Nilgiris",
+]
+SKILLS = ["Harvesting", "Weeding", "Transplanting", "Sowing", "Tractor Operation", "Spraying",
+          "Irrigation", "Pruning", "Threshing", "Loading"]
+MACHINES = ["Tractor", "Combine Harvester", "Rotavator", "Power Tiller", "Paddy Transplanter",
+            "Sprayer", "Thresher", "Seed Drill"]
+CROPS = ["rice", "sugarcane", "banana", "coconut", "cotton", "maize", "groundnut", "turmeric"]
+FIRST = ["Arun", "Bala", "Devi", "Ganesh", "Kavya", "Lakshmi", "Mani", "Meena", "Murugan", "Priya",
+         "Ravi", "Saravanan", "Selvi", "Senthil", "Suresh", "Vani", "Vijay", "Anitha", "Karthik", "Revathi"]
+
+
+def default_counts(bookings):
+    """Worker head counts for a given booking volume, roughly what a growing district sees."""
+    return {
+        "landowners": max(5, bookings // 20),
+        "laborers": max(20, min(bookings // 25, 800)),
+        "machinery": max(5, min(bookings // 100, 200)),
+    }
+
+
+def _weighted_place(rnd):
+    # a few districts are much busier than the rest
+    return PLACES[min(int(rnd.paretovariate(1.5)) - 1, len(PLACES) - 1)] if rnd.random() < 0.3 else rnd.choice(PLACES)
+
+
+def _users(rnd, role, n, start):
+    rows = []
+    for i in range(start, start + n):
+        name = f"{rnd.choice(FIRST)} {chr(65 + i % 26)}"
+        row = {"role": role, "name": name, "username": f"{role}{i}", "password": "pass",
+               "contact": f"9{rnd.randrange(10 ** 9):09d}", "address": _weighted_place(rnd)}
+        if role == "landowner":
+            row.update(acres=rnd.choice([1, 2, 2, 3, 5, 5, 8, 12, 20]),
+                       crops=", ".join(rnd.sample(CROPS, rnd.randint(1, 3))))
+        elif role == "labor":
+            age = rnd.randint(19, 60)
+            row.update(dob=f"{2026 - age}-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}", age=age,
+                       gender=rnd.choice(["male", "female"]),
+                       skills=", ".join(rnd.sample(SKILLS, rnd.choice([1, 1, 2, 2, 3]))),
+                       outstation="yes" if rnd.random() < 0.1 else "no")
+        elif role == "machinery":
+            row.update(machine_type=rnd.choice(MACHINES))
+        rows.append(row)
+    return rows
+
+
+def _bookings(rnd, n, landowner_ids, season_start):
+    rows = []
+    for _ in range(n):
+        stype = rnd.choices(["labor", "machinery", "both"], weights=[50, 25, 25])[0]
+        wants_labor = stype in ("labor", "both")
+        start = season_start + timedelta(days=rnd.randrange(365))
+        days = rnd.choice([1, 1, 2, 2, 3, 5, 7])
+        rows.append({
+            "landowner_id": rnd.choice(landowner_ids),
+            "service_date": start,
+            "days": days,
+            "end_date": start + timedelta(days=days - 1),
+            "service_type": stype,
+            "num_labor": min(int(rnd.expovariate(1 / 4)) + 1, 25) if wants_labor else None,
+            "machine_type": rnd.choice(MACHINES) if stype != "labor" else "",
+            "skill": rnd.choice(SKILLS) if wants_labor and rnd.random() < 0.7 else None,
+        })
+    return rows
+
+
+def seed(bookings, landowners=None, laborers=None, machinery=None, response_rate=0.35, accept_rate=0.55,
+         random_seed=0, echo=print):
+    """Seed the database ``app`` is configured with. Returns the row counts created."""
+    from app import Booking, BookingEligibility, BookingResponse, BookingRollup, User, db, rebuild_eligibility, \
+        rebuild_rollups, reconcile_counters, setup
+
+    rnd = random.Random(random_seed)
+    counts = default_counts(bookings)
+    counts.update({k: v for k, v in (("landowners", landowners), ("laborers", laborers),
+                                     ("machinery", machinery)) if v is not None})
+
+    setup()
+    if Booking.query.first() or User.query.first():
+        raise SystemExit("refusing to seed a database that already has data")
+
+    users = (_users(rnd, "admin", 1, 0) + _users(rnd, "landowner", counts["landowners"], 0)
+             + _users(rnd, "labor", counts["laborers"], 0) + _users(rnd, "machinery", counts["machinery"], 0))
+    db.session.execute(db.insert(User), users)
+    landowner_ids = [uid for (uid,) in db.session.query(User.id).filter_by(role="landowner")]
+    echo(f"users: {len(users)}")
+
+    season_start = date.today() - timedelta(days=180)
+    for start in range(0, bookings, 5000):
+        db.session.execute(db.insert(Booking), _bookings(rnd, min(5000, bookings - start), landowner_ids, season_start))
+    db.session.commit()
+    echo(f"bookings: {bookings}")
+
+    rebuild_eligibility()
+    echo(f"routed: {BookingEligibility.query.count()} worker slots")
+
+    # responses only from routed workers; labor stops accepting once the headcount is met
+    roles = dict(db.session.query(User.id, User.role).filter(User.role.in_(["labor", "machinery"])))
+    wanted = dict(db.session.query(Booking.id, Booking.num_labor))
+    responses, accepted = [], {}
+    routed = db.session.query(BookingEligibility.booking_id, BookingEligibility.user_id) \
+        .order_by(BookingEligibility.booking_id).yield_per(10000)
+    for booking_id, user_id in routed:
+        if rnd.random() >= response_rate:
+            continue
+        role = roles[user_id]
+        taken = accepted.get((booking_id, role), 0)
+        full = taken >= (wanted[booking_id] or 0) if role == "labor" else taken >= 1
+        answer = "Accept" if not full and rnd.random() < accept_rate else "Reject"
+        if answer == "Accept":
+            accepted[(booking_id, role)] = taken + 1
+        responses.append({"booking_id": booking_id, "user_id": user_id, "response": answer, "user_role": role})
+    for start in range(0, len(responses), 10000):
+        db.session.execute(db.insert(BookingResponse), responses[start:start + 10000])
+    db.session.commit()
+    echo(f"responses: {len(responses)}")
+
+    reconcile_counters()
+    # the bulk inserts above skip the incremental rollup updates
+    rebuild_rollups()
+    echo(f"rollups: {BookingRollup.query.count()} rows")
+    return {"users": len(users), "bookings": bookings, "responses": len(responses),
+            "eligibility": BookingEligibility.query.count()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--db", required=True, help="SQLite file to create, e.g. /tmp/krishikaya-10k.db")
+    parser.add_argument("--bookings", type=int, default=1000)
+    parser.add_argument("--landowners", type=int)
+    parser.add_argument("--laborers", type=int)
+    parser.add_argument("--machinery", type=int)
+    parser.add_argument("--seed", type=int, default=0, help="random seed, for reproducible data")
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.abspath(args.db)
+    from app import app
+    with app.app_context():
+        seed(args.bookings, args.landowners, args.laborers, args.machinery, random_seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+// Live booking rows: patch statuses from the /events stream and send
+// Accept/Reject through the JSON endpoint instead of reloading the page.
+(function () {
+  const table = document.querySelector('table[data-live]');
+  if (!table) return;
+
+  function row(id) {
+    return table.querySelector('tr[data-booking-id="' + id + '"]');
+  }
+
+  function patch(data) {
+    const tr = row(data.id);
+    if (!tr) return;
+    Object.keys(data).forEach(function (field) {
+      const cell = tr.querySelector('[data-field="' + field + '"]');
+      if (!cell) return;
+      const value = data[field];
+      cell.textContent = Array.isArray(value) ? (value.join(', ') || '-') : value;
+    });
+    const actions = tr.querySelector('[data-actions]');
+    if (actions && data.open_for_more === false && actions.querySelector('form')) {
+      actions.textContent = 'Closed';
+    }
+  }
+
+  function toast(message, category) {
+    let container = document.querySelector('.toast-container');
+    if (!container) {
+      container = document.createElement('div');
+      container.className = 'toast-container';
+      document.body.appendChild(container);
+    }
+    const t = document.createElement('div');
+    t.className = 'toast ' + category;
+    t.textContent = message;
+    container.appendChild(t);
+    setTimeout(function () { t.style.opacity = '0'; }, 2500);
+    setTimeout(function () { t.remove(); }, 3000);
+  }
+
+  if (window.EventSource) {
+    const ids = Array.prototype.map.call(table.querySelectorAll('tr[data-booking-id]'), function (tr) {
+      return tr.dataset.bookingId;
+    });
+    if (ids.length) {
+      const source = new EventSource(table.dataset.stream + '?bookings=' + ids.join(','));
+      source.onmessage = function (e) { patch(JSON.parse(e.data)); };
+    }
+  }
+
+  if (!window.fetch) return;
+  table.addEventListener('submit', function (e) {
+    const form = e.target;
+    const button = e.submitter;
+    if (!button) return;  // let the plain POST handle old browsers
+    e.preventDefault();
+    const id = form.querySelector('[name=booking_id]').value;
+    fetch('/bookings/' + id + '/response', {
+      method: 'POST',
+      headers: {'Content-Type': 'application/json', 'Accept': 'application/json'},
+      body: JSON.stringify({response: button.value}),
+    }).then(function (res) {
+      return res.json().then(function (body) {
+        toast(body.message, body.ok ? 'success' : (res.status === 409 ? 'info' : 'danger'));
+        if (body.booking) patch(body.booking);
+        const done = {responded: 'Responded', closed: 'Closed', busy: 'Busy'}[body.reason];
+        if (done) form.parentNode.textContent = done;
+      });
+    }).catch(function () { toast('Could not reach the server, try again', 'danger'); });
+  });
+})();
@@ -0,0 +1,166 @@
+"""Race many workers to accept the same booking and check nothing is over-allocated.
+
+    python stress.py --processes 4 --threads 8 --slots 5
+
+A fresh database gets one landowner, one labor booking with --slots places
+and one machinery booking, and enough laborers and machinery owners for
+every thread. Each process imports the app on its own, like a gunicorn
+worker. Its threads then hit POST /bookings/<id>/response at the same
+moment. Every user sends Accept twice, so the run also covers the
+double-submit race.
+
+Afterwards the run checks that:
+
+* no more than --slots laborers, and exactly one machine, were accepted
+* nobody has two responses
+* the booking counters match the response rows
+
+It prints the outcome counts and the throughput, and exits non-zero if any
+check fails.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import date
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+
+
+# ---------------- ONE WORKER (child process) ---------------- #
+def run_worker(user_ids, booking_id, start_at):
+    from app import app
+
+    app.test_client().get("/")  # setup() outside the race
+    outcomes = Counter()
+    lock = threading.Lock()
+
+    def accept_twice(uid):
+        client = app.test_client()
+        with client.session_transaction() as s:
+            s["user_id"] = uid
+        time.sleep(max(0.0, start_at - time.time()))
+        for _ in range(2):
+            try:
+                r = client.post(f"/bookings/{booking_id}/response", json={"response": "Accept"})
+                key = f"{r.status_code} {r.get_json()['message']}" if r.is_json else f"{r.status_code}"
+            except Exception as e:  # e.g. "database is locked" bubbling out of the test client
+                key = f"error {type(e).__name__}: {e}"
+            with lock:
+                outcomes[key] += 1
+
+    threads = [threading.Thread(target=accept_twice, args=(uid,)) for uid in user_ids]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return dict(outcomes)
+
+
+# ---------------- DRIVER ---------------- #
+def prepare(path, workers, slots):
+    """Create the race: returns ({role: [user ids]}, {role: booking id})."""
+    os.environ["DATABASE_URL"] = "sqlite:///" + path
+    from app import Booking, User, app, db, rebuild_eligibility, reconcile_counters, setup
+
+    with app.app_context():
+        setup()
+        owner = User(role="landowner", name="Stress Owner", username="stress-owner", password="pass",
+                     address="Pollachi")
+        db.session.add(owner)
+        db.session.execute(db.insert(User), [
+            {"role": "labor", "name": f"Labor {i}", "username": f"stress-labor{i}", "password": "pass",
+             "address": "Pollachi", "skills": "Harvesting", "outstation": "no"} for i in range(workers)
+        ] + [
+            {"role": "machinery", "name": f"Machine {i}", "username": f"stress-machine{i}", "password": "pass",
+             "address": "Pollachi", "machine_type": "Tractor"} for i in range(workers)
+        ])
+        db.session.flush()
+        labor = Booking(landowner_id=owner.id, service_date=date(2026, 6, 1), days=1, service_type="labor",
+                        num_labor=slots, skill="Harvesting")
+        machinery = Booking(landowner_id=owner.id, service_date=date(2026, 6, 1), days=1, service_type="machinery",
+                            machine_type="Tractor")
+        db.session.add_all([labor, machinery])
+        db.session.commit()
+        rebuild_eligibility()
+        reconcile_counters()
+        users = {role: [uid for (uid,) in db.session.query(User.id).filter_by(role=role).order_by(User.id)]
+                 for role in ("labor", "machinery")}
+        return users, {"labor": labor.id, "machinery": machinery.id}
+
+
+def verify(bookings, slots):
+    from app import Booking, BookingResponse, app, db
+
+    failures = []
+    with app.app_context():
+        db.session.expire_all()
+        for role, booking_id in bookings.items():
+            b = Booking.query.get(booking_id)
+            rows = BookingResponse.query.filter_by(booking_id=booking_id).all()
+            accepted = sum(r.response == "Accept" for r in rows)
+            capacity = slots if role == "labor" else 1
+            if accepted > capacity:
+                failures.append(f"{role}: {accepted} accepted for {capacity} slot(s)")
+            if len({r.user_id for r in rows}) != len(rows):
+                failures.append(f"{role}: a user responded twice")
+            if getattr(b, f"{role}_accepted") != accepted:
+                failures.append(f"{role}: counter says {getattr(b, f'{role}_accepted')}, rows say {accepted}")
+            print(f"{role} booking {booking_id}: {accepted}/{capacity} accepted, status {b.action}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8, help="threads per process")
+    parser.add_argument("--slots", type=int, default=5, help="laborers the labor booking needs")
+    parser.add_argument("--db", help="SQLite file to use (default: a new temporary file)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        job = json.loads(args.child)
+        json.dump(run_worker(job["users"], job["booking"], job["start_at"]), sys.stdout)
+        return
+
+    path = os.path.abspath(args.db or os.path.join(tempfile.mkdtemp(prefix="krishikaya-stress-"), "stress.db"))
+    if os.path.exists(path):
+        raise SystemExit(f"{path} already exists; stress runs need a fresh database")
+    workers = args.processes * args.threads
+    users, bookings = prepare(path, workers, args.slots)
+
+    outcomes = Counter()
+    for role in ("labor", "machinery"):
+        start_at = time.time() + 2  # every process imports the app before the race starts
+        children = []
+        for p in range(args.processes):
+            job = {"users": users[role][p::args.processes], "booking": bookings[role], "start_at": start_at}
+            children.append(subprocess.Popen([sys.executable, os.path.abspath(__file__), "--child", json.dumps(job)],
+                                             env=dict(os.environ, DATABASE_URL="sqlite:///" + path),
+                                             stdout=subprocess.PIPE, text=True))
+        for child in children:
+            out, _ = child.communicate()
+            for key, n in json.loads(out).items():
+                outcomes[f"{role}: {key}"] += n
+        elapsed = time.time() - start_at
+        print(f"{role}: {2 * workers} requests from {workers} users in {elapsed:.2f}s "
+              f"({2 * workers / elapsed:.0f} req/s)")
+
+    for key, n in sorted(outcomes.items()):
+        print(f"  {n:>5}  {key}")
+    failures = verify(bookings, args.slots)
+    for failure in failures:
+        print("FAIL", failure)
+    if failures:
+        sys.exit(1)
+    print("OK: no over-allocation, no double responses, counters consistent")
+
+
+if __name__ == "__main__":
+    main()